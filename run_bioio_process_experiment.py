@@ -13,9 +13,8 @@ uv run python bioio_run_process_experiment.py \
 from pathlib import Path
 import argparse
 
-from thorlab_loader.backends.bioio_thorlab_builder import ThorlabBioioBuilder
-from ylabcommon.utils.utils import get_theme, style_print
-from ylabcommon.io.output_build_dir import build_output_dir_name
+# ThorlabBioioBuilder and ylabcommon are imported in main(), after argument
+# parsing, so --help does not load the BioIO stack.
 
 ##Before used
 #from thorlab_loader.backends.bioio_thorlab_builder import ThorlabBioioBuilder
@@ -86,10 +85,56 @@ def build_parser() -> argparse.ArgumentParser:
         help="Compression level (0–9)",
     )
 
+    parser.add_argument(
+        "--output-format",
+        choices=["ome-tiff", "ome-zarr"],
+        default="ome-tiff",
+        help="Output container (ome-zarr needs the 'zarr' extra)",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Threads writing OME-Zarr chunks",
+    )
+
+    parser.add_argument(
+        "--pyramid",
+        action="store_true",
+        help="Write tiled OME-TIFF with multi-resolution pyramid levels",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=None,
+        help="Conversion cache shared between output directories",
+    )
+
+    parser.add_argument(
+        "--cache-size-gb",
+        type=float,
+        default=100,
+        help="Cache size cap in GB (least recently used evicted first)",
+    )
+
+    parser.add_argument(
+        "--cache-hardlink",
+        action="store_true",
+        help="Hardlink cache hits instead of reflinking / copying them",
+    )
+
+    parser.add_argument(
+        "--use-index",
+        action="store_true",
+        help="Keep a persistent index of the TIFF directory for faster reruns",
+    )
+
     parser.add_argument(
         "--dry_run", 
         action="store_true", 
-        help="Run full pipeline without writing any output files"
+        help="Plan the output (shape, dtype, name, estimated size, validation) from file names, TIFF headers and Experiment.xml; no pixels are read"
     )
 
     parser.add_argument("--verbose", action="store_true")
@@ -104,6 +149,10 @@ def main() -> None:
 
     parser = build_parser()
     args = parser.parse_args()
+
+    from thorlab_loader.backends.bioio_thorlab_builder import ThorlabBioioBuilder
+    from ylabcommon.utils.utils import get_theme, style_print
+    from ylabcommon.io.output_build_dir import build_output_dir_name
     
     #dataset_name = args.tiff_dir.name
     dataset_name = args.base_path
@@ -135,7 +184,15 @@ def main() -> None:
         compression=args.compression,
         compression_level=args.compression_level,
         validate_metadata=True if args.no_validate else False,
+        fail_fast=not args.no_validate,
         dry_run=args.dry_run,
+        pyramid=args.pyramid,
+        output_format=args.output_format,
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+        cache_size=int(args.cache_size_gb * 2**30),
+        cache_hardlink=args.cache_hardlink,
+        use_index=args.use_index,
     )
 
     builder.build()
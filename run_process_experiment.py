@@ -16,8 +16,6 @@ import datetime
 import json
 from pathlib import Path
 
-from thorlab_loader.builder import ThorlabBuilder
-
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s | %(levelname)s | %(message)s",
@@ -36,6 +34,15 @@ def write_summary(summary: dict, outdir: Path):
         json.dump(summary, f, indent=2)
     logger.info(f"Summary written → {summary_path}")
 
+
+def parse_position(value: str):
+    try:
+        sx, sy = (int(v) for v in value.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a sx,sy pair, got '{value}'")
+    return sx, sy
+
+
 # --------------------------------------------------
 # CLI
 # --------------------------------------------------
@@ -54,6 +61,53 @@ def parse_args():
     p.add_argument("--save_raw", action="store_true",
                    help="Also save raw TIFFs")
 
+    p.add_argument("--workers", type=int, default=1,
+                   help="Number of threads used to read TIFF planes")
+
+    p.add_argument("--stream", action="store_true",
+                   help="Write OME-TIFF page by page (bounded memory for deep stacks)")
+
+    p.add_argument("--output_format", type=str, default="ome-tiff",
+                   choices=["ome-tiff", "ome-zarr"],
+                   help="Output container (ome-zarr needs the 'zarr' extra)")
+
+    p.add_argument("--compression", type=str, default=None,
+                   choices=["none", "zlib", "zstd", "lzw", "lz4"],
+                   help="Compression (default: none; lzw is TIFF only, lz4 is Zarr only)")
+    p.add_argument("--compression_level", type=int, default=None,
+                   help="Compression level (zlib 1-9, zstd 1-22)")
+    p.add_argument("--predictor", action="store_true",
+                   help="Use horizontal predictor with compression")
+
+    p.add_argument("--pyramid", action="store_true",
+                   help="Write tiled OME-TIFF with multi-resolution pyramid levels")
+
+    p.add_argument("--hyperstack", type=str, default=None,
+                   choices=["position", "series"],
+                   help="One TCZYX OME-TIFF per stage position, or all positions "
+                        "as series of one file")
+
+    p.add_argument("--resume", action="store_true",
+                   help="Skip groups already finished in the output directory")
+
+    p.add_argument("--cache_dir", type=str, default=None,
+                   help="Conversion cache shared between output directories")
+    p.add_argument("--cache_size_gb", type=float, default=100,
+                   help="Cache size cap in GB (least recently used evicted first)")
+    p.add_argument("--cache_hardlink", action="store_true",
+                   help="Hardlink cache hits instead of reflinking / copying them")
+
+    p.add_argument("--use_index", action="store_true",
+                   help="Keep a persistent index of the TIFF directory for faster reruns")
+
+    p.add_argument("--plan_from_xml", action="store_true",
+                   help="Check the files expected from Experiment.xml and report missing planes")
+    p.add_argument("--positions", type=parse_position, nargs="+", default=None,
+                   help="Stage positions for --plan_from_xml as sx,sy pairs (e.g. 1,1 2,1); "
+                        "skips listing the TIFF directory")
+    p.add_argument("--digits", type=int, default=None,
+                   help="Zero padding of the file indices for --plan_from_xml (default: probed)")
+
     p.add_argument("--verbose", action="store_true")
 
     return p.parse_args()
@@ -66,6 +120,9 @@ def parse_args():
 def main():
     args = parse_args()
 
+    # imported after argument parsing so --help does not load the pipeline
+    from thorlab_loader.builder import ThorlabBuilder
+
     if args.verbose:
         logger.setLevel(logging.DEBUG)
 
@@ -88,11 +145,33 @@ def main():
     logger.info(f"TIFF dir   : {tiff_dir}")
     logger.info(f"XML        : {xml_path}")
     logger.info(f"Output dir : {output_dir}")
+    logger.info(f"Workers    : {args.workers}")
 
     start = time.time()
     try:
-        builder = ThorlabBuilder(str(tiff_dir), str(xml_path))
-        saved_files = builder.run_and_save(str(output_dir), save_raw=args.save_raw)
+        builder = ThorlabBuilder(
+            str(tiff_dir), str(xml_path),
+            workers=args.workers,
+            cache_dir=args.cache_dir,
+            cache_size=int(args.cache_size_gb * 2**30),
+            cache_hardlink=args.cache_hardlink,
+            use_index=args.use_index,
+            plan_from_xml=args.plan_from_xml,
+            positions=args.positions,
+            digits=args.digits,
+        )
+        saved_files = builder.run_and_save(
+            str(output_dir),
+            save_raw=args.save_raw,
+            stream=args.stream,
+            compression=args.compression,
+            compression_level=args.compression_level,
+            predictor=args.predictor,
+            pyramid=args.pyramid,
+            output_format=args.output_format,
+            hyperstack=args.hyperstack,
+            resume=args.resume,
+        )
         status = "sucess"
     except Exception as e:
         logger.exception(f"Failed dataset {dataset_name}")
@@ -1,14 +1,33 @@
 """
 Thorlabs Loader package
+
+Public names are imported on first access (PEP 562), so `import
+thorlab_loader` does not pull in pandas, tifffile or ylabcommon.
 """
-from .builder import ThorlabBuilder
-from .tiff_reader import read_stack
-from .tiff_writer import save_ome_tiff
+from importlib import import_module
 #from .utils import configure_logging, ensure_parent
 
+_LAZY = {
+    "ThorlabBuilder": ".builder",
+    "read_stack": ".tiff_reader",
+    "save_ome_tiff": ".tiff_writer",
+}
+
 __all__ = [
     "ThorlabBuilder",
     "read_stack",
     "save_ome_tiff",
 ]
 
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,169 @@
+# src/thorlab_loader/backends/bioio_plan.py
+"""
+Pixel-free plan of a BioIO reconstruction, used for --dry_run.
+
+The output shape comes from the parsed file names (T, C, Z counts) and the
+first TIFF header (Y, X, dtype); sizes are estimated from a sample of
+headers. Experiment.xml dims are checked against the planned shape. No
+pixel data is read, so a large acquisition is planned in seconds.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..metadata import ThorlabMetadata
+from ..tiff_reader import probe_layout
+from .bioio_validation import ValidationConfig, validate_plan
+
+# headers probed to estimate the source compression ratio
+SAMPLE_HEADERS = 32
+
+# rough output / raw size ratio when the sources are uncompressed
+NOMINAL_COMPRESSION_RATIO = {
+    "zlib": 0.6,
+    "deflate": 0.6,
+    "zstd": 0.55,
+    "lzw": 0.75,
+    "lz4": 0.7,
+}
+
+# TIFF compression code of uncompressed data
+_COMPRESSION_NONE = 1
+
+# TIFF compression codes of the source codecs with a nominal ratio
+_SOURCE_CODECS = {5: "lzw", 8: "zlib", 32946: "zlib", 50000: "zstd"}
+
+
+@dataclass
+class StackPlan:
+    """
+    Planned output of one reconstruction.
+
+    shape:            (T, C, Z, Y, X) of the stacked array
+    estimated_bytes:  expected written size; `estimate_source` says how it
+                      was derived (from the source bytecounts, a nominal
+                      ratio, or uncompressed)
+    validation:       report in the _validate_thorlab_stack format
+    """
+
+    tiff_count: int
+    shape: Tuple[int, int, int, int, int]
+    dtype: np.dtype
+    channels: List[str]
+    positions: List[Tuple[int, int]]
+    output_path: Optional[Path]
+    pixel_size: Tuple
+    uncompressed_bytes: int
+    estimated_bytes: int
+    estimate_source: str
+    validation: Dict = field(default_factory=dict)
+
+
+def format_bytes(n: int) -> str:
+    size = float(n)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+
+def _sample(paths, n: int) -> List[str]:
+    if len(paths) <= n:
+        return list(paths)
+    return [paths[i] for i in np.linspace(0, len(paths) - 1, n).astype(int)]
+
+
+def estimate_output_bytes(
+    layouts: List[dict],
+    uncompressed: int,
+    compression: Optional[str],
+    pyramid: bool = False,
+) -> Tuple[int, str]:
+    """
+    (estimated bytes, source) of the written output.
+
+    Compressed sources give their own ratio (databytes / raw plane bytes of
+    the sampled headers), scaled by the nominal target / source codec ratio
+    when the output uses another codec (e.g. LZW sources written as zstd);
+    uncompressed sources use NOMINAL_COMPRESSION_RATIO of the target codec.
+    Pyramid levels add about a third (each level is a quarter of the last).
+    """
+    target = str(compression).lower() if compression else "none"
+    codes = {l["compression"] for l in layouts}
+
+    if target == "none":
+        ratio, source = 1.0, "uncompressed"
+    elif layouts and _COMPRESSION_NONE not in codes:
+        raw = sum(int(np.prod(l["shape"])) * l["dtype"].itemsize for l in layouts)
+        ratio = sum(l["databytes"] for l in layouts) / raw if raw else 1.0
+        source_codec = _SOURCE_CODECS.get(codes.pop()) if len(codes) == 1 else None
+        if source_codec == target:
+            source = "source bytecounts"
+        elif source_codec and target in NOMINAL_COMPRESSION_RATIO:
+            ratio *= NOMINAL_COMPRESSION_RATIO[target] / NOMINAL_COMPRESSION_RATIO[source_codec]
+            source = f"source bytecounts, scaled {source_codec} → {target}"
+        else:
+            source = "source bytecounts, source codec ratio (not scaled)"
+    else:
+        ratio = NOMINAL_COMPRESSION_RATIO.get(target, 1.0)
+        source = "nominal ratio"
+
+    estimate = uncompressed * min(ratio, 1.0)
+    if pyramid:
+        estimate *= 4 / 3
+    return int(estimate), source
+
+
+def plan_stack(
+    meta: ThorlabMetadata,
+    xml_meta: Optional[Dict] = None,
+    *,
+    layout: Callable[[str], dict] = probe_layout,
+    output_path: Optional[Path] = None,
+    compression: Optional[str] = "zlib",
+    pyramid: bool = False,
+    pixel_size: Optional[Tuple] = None,
+    sample: int = SAMPLE_HEADERS,
+    config: Optional[ValidationConfig] = None,
+) -> StackPlan:
+    """
+    Plan the TCZYX stack of `meta` from file names and TIFF headers.
+
+    layout: header reader of one path (tiff_reader.probe_layout, or
+            DatasetIndex.layout to reuse indexed headers)
+    config: strictness of the Experiment.xml checks (see rejected_checks)
+    """
+    paths = meta.paths.tolist()
+    if not paths:
+        raise RuntimeError("No valid TIFF files found.")
+
+    layouts = [layout(p) for p in _sample(paths, sample)]
+    (ny, nx), dtype = layouts[0]["shape"], layouts[0]["dtype"]
+
+    nt = len(np.unique(meta.index["t"]))
+    nz = len(np.unique(meta.index["z"]))
+    channels = meta.channel_names()
+    shape = (nt, len(channels), nz, int(ny), int(nx))
+
+    positions = meta.positions()
+    uncompressed = int(np.prod(shape)) * dtype.itemsize * len(positions)
+    estimated, source = estimate_output_bytes(layouts, uncompressed, compression, pyramid)
+
+    plan = StackPlan(
+        tiff_count=len(paths),
+        shape=shape,
+        dtype=dtype,
+        channels=channels,
+        positions=positions,
+        output_path=Path(output_path) if output_path else None,
+        pixel_size=pixel_size,
+        uncompressed_bytes=uncompressed,
+        estimated_bytes=estimated,
+        estimate_source=source,
+    )
+    plan.validation = validate_plan(xml_meta, plan, layouts, config)
+    return plan
@@ -2,21 +2,18 @@ from pathlib import Path
 from typing import Optional
 import json
 from datetime import datetime, UTC, timezone
-from bioio_base.types import PhysicalPixelSizes
 
-from ylabcommon.io.file_selection import collect_valid_tiffs
-from ylabcommon.io.outfile_name import build_output_name, extract_dimensions, build_stack_filename
-from ylabcommon.io.summary_metadata_helper import get_enhanced_metadata, generate_file_sha256
 from ylabcommon.utils.utils import hybrid, style_print
-from ylabcommon.utils.report_builder import ReportBuilder
-from ..xml_parser import ExperimentXMLParser
-
-from ylabcommon.bioio.bioio_reader import BioIOReader
+from ..experiment_context import experiment_context
+from ..manifest import atomic_outputs, input_fingerprint
+from ..cache import ConversionCache, DEFAULT_CACHE_SIZE
+from .bioio_validation import ValidationConfig, rejected_checks
+
+# The BioIO stack (bioio, xarray, dask, ome-types), the ylabcommon.io helpers,
+# the report builder, the pixel writers and the dataset index are imported
+# inside the stages that use them, so importing this module (e.g. for --help)
+# and a --dry_run plan stay cheap.
 #from ylabcommon.bioio.bioio_metadata import BioIOMetadataExtractor
-from ylabcommon.bioio.thorlab_metadata_extractor import ThorlabMetadataExtractor
-from ylabcommon.bioio.bioio_writer import BioIOWriter
-from ylabcommon.bioio.thorlab_params_adapter import ThorlabParamsAdapter
-from ylabcommon.bioio.thorlab_bioio_stack_builder import stack_thorlab_with_bioio_calibrated, stack_with_bioio, get_channel_names_index
 
 
 
@@ -25,8 +22,14 @@ class ThorlabBioioBuilder:
     """
     Full reconstruction pipeline:
 
-    TIFF discovery → Ultra stacking → BioIOReader →
-    Metadata extraction → XML validation → Output naming → Write OME
+    TIFF discovery → Plan + pre-stack XML validation → Ultra stacking →
+    BioIOReader → Metadata extraction → XML validation → Output naming → Write OME
+
+    The plan (file names, TIFF headers, Experiment.xml) is checked against
+    `validation_config` before any pixel is decoded. With fail_fast (the
+    default) strict mismatches raise ValueError; fail_fast=False (the CLI's
+    --no_validate) only reports them. This is independent of
+    validate_metadata, which governs the post-stack check and writing.
     """
 
     def __init__(
@@ -39,6 +42,15 @@ class ThorlabBioioBuilder:
         compression_level: int = 6,
         validate_metadata: bool = True,
         dry_run: str = False,
+        pyramid: bool = False,
+        output_format: str = "ome-tiff",
+        workers: int = 4,
+        cache_dir: Optional[Path] = None,
+        cache_size: Optional[int] = DEFAULT_CACHE_SIZE,
+        cache_hardlink: bool = False,
+        use_index: bool = False,
+        validation_config: Optional[ValidationConfig] = None,
+        fail_fast: bool = True,
     ):
 
         self.tiff_dir = Path(tiff_dir)
@@ -49,6 +61,16 @@ class ThorlabBioioBuilder:
         self.compression = compression
         self.compression_level = compression_level
         self.validate_metadata = validate_metadata
+        self.pyramid = pyramid
+        self.output_format = output_format
+        self.workers = workers
+        self.cache = (
+            ConversionCache(cache_dir, cache_size, hardlink=cache_hardlink) if cache_dir else None
+        )
+        self.use_index = use_index
+        self.index_dir = Path(cache_dir) / "index" if cache_dir else None
+        self.validation_config = validation_config or ValidationConfig()
+        self.fail_fast = fail_fast
 
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
@@ -56,24 +78,53 @@ class ThorlabBioioBuilder:
     # TIFF DISCOVERY + STACK
     # -------------------------------------------------
 
-    def _get_params(self):
-        params_adapter = ThorlabParamsAdapter(self.xml_file)
-        get_thorlabs_params = params_adapter.extract()
-        return get_thorlabs_params
+    @property
+    def context(self):
+        """Experiment.xml parsed once (memoized by path + mtime), or None."""
+        return experiment_context(self.xml_file) if self.xml_file else None
 
-    def _discover_and_stack(self):
+    def _get_params(self, ctx=None):
+        ctx = ctx or self.context
+        if ctx is None:
+            from ylabcommon.bioio.thorlab_params_adapter import ThorlabParamsAdapter
 
+            return ThorlabParamsAdapter(self.xml_file).extract()
+        return ctx.params
+
+    def _discover(self):
+        """
+        (tiff_files, index): the usable TIFFs, and the refreshed DatasetIndex
+        when use_index is set (else None).
+        """
         print("[Builder] Discovering valid TIFF files...")
 
-        tiff_files = collect_valid_tiffs(self.tiff_dir)
+        index = None
+        if self.use_index:
+            from ..dataset_index import DatasetIndex
+
+            # persisted, incrementally refreshed listing of the Thorlabs planes
+            index = DatasetIndex(self.tiff_dir, self.index_dir, workers=max(8, self.workers))
+            tiff_files = [Path(p) for p in index.refresh().paths()]
+        else:
+            from ylabcommon.io.file_selection import collect_valid_tiffs
+
+            tiff_files = collect_valid_tiffs(self.tiff_dir)
 
         if not tiff_files:
             raise RuntimeError("No valid TIFF files found.")
 
         print(f"[Builder] Found {len(tiff_files)} usable TIFF files")
+        return tiff_files, index
+
+    def _discover_and_stack(self, ctx=None, tiff_files=None):
+
+        if tiff_files is None:
+            tiff_files, _ = self._discover()
         print("[Builder] Ultra stacking images...")
         
-        get_thorlabs_params = self._get_params()
+        from ylabcommon.bioio.thorlab_bioio_stack_builder import stack_thorlab_with_bioio_calibrated
+
+        get_thorlabs_params = self._get_params(ctx)
         stacked_data, tiff_files = stack_thorlab_with_bioio_calibrated(tiff_files, self.xml_file, get_thorlabs_params)
         #stacked_data, tiff_files = stack_with_bioio(tiff_files)
 
@@ -83,25 +134,115 @@ class ThorlabBioioBuilder:
         data_to_process = stacked_data.data
         return data_to_process, tiff_files
 
+    # -------------------------------------------------
+    # DRY RUN PLAN (no pixel data)
+    # -------------------------------------------------
+
+    def plan(self, ctx=None, discovered=None):
+        """
+        StackPlan of the output from file names, TIFF headers and
+        Experiment.xml only: shape, dtype, output path, estimated sizes
+        and validation status. No pixel data is read.
+
+        discovered: (tiff_files, index) from _discover(), to list only once
+        """
+        from ylabcommon.io.outfile_name import build_stack_filename, extract_dimensions
+        from ..metadata import ThorlabMetadata
+        from ..tiff_reader import probe_layout
+        from .bioio_plan import plan_stack
+
+        ctx = ctx or self.context
+        xml_meta = ctx.xml_meta if ctx else {}
+
+        tiff_files, index = discovered or self._discover()
+        if index is not None:
+            meta, layout = index.metadata(xml_meta), index.layout
+        else:
+            meta, layout = ThorlabMetadata(xml_meta, [str(p) for p in tiff_files]), probe_layout
+
+        image_name, dims = extract_dimensions(tiff_files)
+        output_path = self._output_path(build_stack_filename(self.output_dir, image_name, dims))
+
+        return plan_stack(
+            meta,
+            xml_meta,
+            layout=layout,
+            output_path=output_path,
+            compression=self.compression,
+            pyramid=self.pyramid and self.output_format != "ome-zarr",
+            pixel_size=ctx.pixel_size if ctx else None,
+            config=self.validation_config,
+        )
+
+    def _check_plan(self, plan):
+        """
+        Pre-stack validation: with fail_fast, raise ValueError on checks
+        that are strict under validation_config, before any pixel is decoded.
+        """
+        print(f"[Builder] Pre-stack validation: {plan.validation['status']}")
+        for check in plan.validation["checks"]:
+            if not check["ok"]:
+                status = "FAIL" if check["strict"] else "WARN"
+                print(f"[{status}] {check['name']}: {check['msg']}")
+
+        rejected = rejected_checks(plan.validation)
+        if not rejected:
+            return
+        if not self.fail_fast:
+            style_print("Skipping pre-stack rejection, fail_fast disabled (--no_validate)", "info")
+            return
+        detail = "; ".join(f"{c['name']} ({c['msg']})" for c in rejected)
+        raise ValueError(f"Dataset {self.tiff_dir} rejected before stacking: {detail}")
+
+    def _print_plan(self, plan):
+        from .bioio_plan import format_bytes
+
+        style_print("[DRY RUN ENABLED]", "info")
+        for check in plan.validation["checks"]:
+            status = "PASS" if check["ok"] else "FAIL" if check["strict"] else "WARN"
+            print(f"[{status}] {check['name']}: {check['msg']}")
+        print(f"[Validating] Validation status: {plan.validation['status']}")
+        print("[Skipping] stacking, file writing and summary JSON writing")
+        print("\n    EXECUTION SUMMARY    \n")
+        print(f"Input TIFF count : {plan.tiff_count}")
+        print(f"Positions        : {len(plan.positions)}")
+        print(f"Channels         : {', '.join(plan.channels)}")
+        print(f"Stack shape      : {plan.shape} (TCZYX)")
+        print(f"Data type        : {plan.dtype}")
+        print(f"Pixel size (µm)  : {plan.pixel_size}")
+        print(f"Output name      : {plan.output_path.name}")
+        print(f"Uncompressed     : {format_bytes(plan.uncompressed_bytes)}")
+        print(
+            f"Estimated output : {format_bytes(plan.estimated_bytes)} "
+            f"({self.compression}, {plan.estimate_source})"
+        )
+        print("\nDry run completed successfully.\n")
+
     # -------------------------------------------------
     # BioIO Processing Reader
     # -------------------------------------------------
 
-    def _load_with_bioio(self, stacked_data):
+    def _load_with_bioio(self, stacked_data, ctx=None):
+
+        from ylabcommon.bioio.bioio_reader import BioIOReader
+        from ylabcommon.bioio.thorlab_metadata_extractor import ThorlabMetadataExtractor
+        from ylabcommon.bioio.thorlab_bioio_stack_builder import get_channel_names_index
 
         print("[Builder] Loading stacked data via BioIOReader...")
 
         reader = BioIOReader(stacked_data)
 
         data = reader.read()
-        params = self._get_params()
+        params = self._get_params(ctx)
         #params = get_thorlabs_params(self.xml_file)
         dx = params.get("PixelSizeX", 1.0)
         dy = params.get("PixelSizeY", dx)
         dz = params.get("PixelSizeZ", 1.0)
         channel_names_str = params.get("ChannelNames")
         current_pixel_size = (dz, dy, dx) # The (Z, Y, X) tuple
-        channel_names_index = get_channel_names_index(self.xml_file)
+        channel_names_index = (
+            ctx.channel_names_index if ctx else get_channel_names_index(self.xml_file)
+        )
 
         extractor = ThorlabMetadataExtractor(
             reader, 
@@ -227,10 +368,28 @@ class ThorlabBioioBuilder:
     # WRITE OUTPUT
     # -------------------------------------------------
 
+    def _output_path(self, output_path) -> Path:
+        """Final output path: .ome.zarr / .ome.tif appended for the zarr and pyramid writers."""
+        path = Path(output_path)
+        if self.output_format == "ome-zarr":
+            if not path.name.endswith(".ome.zarr"):
+                path = path.with_name(f"{path.name}.ome.zarr")
+        elif self.pyramid and not path.name.endswith(".ome.tif"):
+            path = path.with_name(f"{path.name}.ome.tif")
+        return path
+
     def _write(self, data, image_meta, output_path):
 
         print("[Builder] Writing OME output...")
 
+        if self.output_format == "ome-zarr":
+            return self._write_zarr(data, image_meta, output_path)
+
+        if self.pyramid:
+            return self._write_pyramid(data, image_meta, output_path)
+
+        from ylabcommon.bioio.bioio_writer import BioIOWriter
+
         writer = BioIOWriter(
             output_path,
             compression=self.compression,
@@ -244,12 +403,81 @@ class ThorlabBioioBuilder:
             #physical_pixel_sizes=phys_sizes,
             physical_pixel_sizes=image_meta.pixel_size,
         )
+        return Path(output_path)
+
+    def _cache_key(self, tiff_files, output_path):
+        """
+        Conversion cache key of the discovered inputs (path, size, mtime),
+        Experiment.xml and write options; None without a cache. Only file
+        metadata is read, so it is known before stacking.
+        """
+        if self.cache is None:
+            return None
+        options = {
+            "builder": "bioio",
+            "name": Path(output_path).name,
+            "compression": self.compression,
+            "compression_level": self.compression_level,
+            "pyramid": self.pyramid,
+            "output_format": self.output_format,
+        }
+        return self.cache.key(
+            input_fingerprint([str(p) for p in tiff_files]), self.xml_file, options
+        )
+
+    def _store_cached(self, cache_key, written, reports):
+        """
+        Add the written output and its summary report files to the conversion
+        cache under cache_key, so a hit restores the same output directory.
+        """
+        if cache_key and written is not None and Path(written).exists():
+            self.cache.store(cache_key, [str(written), *map(str, reports)])
+
+    def _write_pyramid(self, data, image_meta, output_path):
+        """
+        Tiled OME-TIFF with SubIFD pyramid levels, written plane by plane.
+        """
+        from ..tiff_writer import save_ome_tiff_pyramid, iter_yx_planes
+
+        path = self._output_path(output_path)
+
+        save_ome_tiff_pyramid(
+            iter_yx_planes(data),
+            str(path),
+            data.shape,
+            data.dtype,
+            pixel_size=image_meta.pixel_size,
+            compression=self.compression,
+            compression_level=self.compression_level,
+        )
+        return path
+
+    def _write_zarr(self, data, image_meta, output_path):
+        """
+        Chunked, sharded OME-Zarr written by a thread pool.
+        """
+        from ..zarr_writer import save_ome_zarr
+
+        path = self._output_path(output_path)
+
+        save_ome_zarr(
+            data,
+            str(path),
+            pixel_size=image_meta.pixel_size,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            workers=self.workers,
+        )
+        return path
+
     # -------------------------------------------------
     # Validation report
     # -------------------------------------------------
 
     def _write_report(self, report, image_meta, output_path, hybrid_channel_name, tiff_files):
 
+        from ylabcommon.io.summary_metadata_helper import get_enhanced_metadata, generate_file_sha256
+
         report_path = output_path.with_suffix(".validation.json")
         extra_meta_summary = get_enhanced_metadata(image_meta, tiff_files)
 
@@ -286,15 +514,36 @@ class ThorlabBioioBuilder:
         print("=============================================================================")
         print("[Builder] Starting BioIO reconstruction pipeline")
 
-        stacked_data, tiff_files = self._discover_and_stack()
+        # Experiment.xml is parsed once here and shared by every stage
+        ctx = self.context
+
+        # file names, TIFF headers and Experiment.xml only
+        discovered = self._discover()
+        plan = self.plan(ctx, discovered)
+
+        if self.dry_run:
+            self._print_plan(plan)
+            return
+
+        self._check_plan(plan)
+
+        # a cache hit is linked into place before any pixel is read
+        cache_key = self._cache_key(discovered[0], plan.output_path)
+        if cache_key:
+            hit = self.cache.fetch(cache_key, plan.output_path.parent)
+            if hit:
+                print(f"[Builder] Cache hit → {hit[0]} (stacking skipped)")
+                print("[Builder] DONE.")
+                return
+
+        stacked_data, tiff_files = self._discover_and_stack(ctx, discovered[0])
 
-        data, image_meta, hybrid_channel_name  = self._load_with_bioio(stacked_data)
+        data, image_meta, hybrid_channel_name  = self._load_with_bioio(stacked_data, ctx)
 
         xml_meta = None
 
-        if self.validate_metadata and self.xml_file:
-            xml = ExperimentXMLParser(self.xml_file)
-            xml_meta = xml.extract_metadata()
+        if self.validate_metadata and ctx:
+            xml_meta = ctx.xml_meta
 
         report = self._validate_thorlab_stack(xml_meta, image_meta)
         
@@ -302,41 +551,29 @@ class ThorlabBioioBuilder:
         T_stack_val = data.shape[0]
         #output_path = build_output_name(self.output_dir, tiff_files, Z_stack_val, T_stack_val)
 
+        from ylabcommon.io.outfile_name import build_stack_filename, extract_dimensions
+
         image_name, dims = extract_dimensions(tiff_files)
 
         output_filename = build_stack_filename(self.output_dir, image_name, dims)
 
         print(output_filename)
 
-
-        if self.dry_run:
-            style_print("[DRY RUN ENABLED]", "info")
-            print("[Validating] TIFF discovery successful")
-            print("[Validating] BioIO stacking successful")
-            print("[Validating]  Metadata extraction successful")
-            print(f"[Validating] Validation status: {report['status']}")
-            print("[Skipping] file writing")
-            print("[Skipping] summary JSON writing")
-            print("\n    EXECUTION SUMMARY    \n")
-            print(f"Input TIFF count : {len(tiff_files)}")
-            print(f"Stack shape      : {data.shape}")
-            print(f"Pixel size (µm)  : {image_meta.pixel_size}")
-            print(f"Output name      : {output_path.name}.ome.tif")
-            print("\nDry run completed successfully.\n")
-            return
-
+        written = None
         if self.validate_metadata:
             style_print("Skipping Validation Run time set args.no_validate", "info")
-            self._write(stacked_data, image_meta, output_filename)
+            written = self._write(stacked_data, image_meta, output_filename)
         else:
             if report["status"] == "VALIDATED":
-                self._write(stacked_data, image_meta, output_filename)
+                written = self._write(stacked_data, image_meta, output_filename)
     
 
         #===============================================================
         #Write summary report 
         #===============================================================
 
+        from ylabcommon.utils.report_builder import ReportBuilder
+
         summary_report = ReportBuilder()
 
         # dataset information
@@ -380,8 +617,13 @@ class ThorlabBioioBuilder:
         # validation
         summary_report.finalize_validation()
 
-        # write report
-        summary_report.write(self.output_dir, output_filename)
+        # write report (staged, so the files it adds are known and cached
+        # next to the output)
+        with atomic_outputs(Path(self.output_dir)) as staging:
+            summary_report.write(staging, output_filename)
+            reports = [Path(self.output_dir) / p.name for p in staging.iterdir()]
+
+        self._store_cached(cache_key, written, reports)
 
         print("[Builder] DONE.")
 
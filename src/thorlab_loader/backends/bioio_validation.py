@@ -7,4 +7,63 @@ class ValidationConfig:
     allow_axis_permutation: bool = True
     strict_dimensions: bool = True      # fail if XYZ mismatch
     strict_channels: bool = True
+    strict_time: bool = True            # fail if SizeT mismatch
 
+
+def validate_plan(xml_meta, plan, layouts=(), config=None):
+    """
+    Experiment.xml dims vs a StackPlan (shape from file names and headers).
+    Same report format as ThorlabBioioBuilder._validate_thorlab_stack; each
+    check also says whether `config` makes a failure fatal ("strict").
+
+    layouts: sampled probe_layout() dicts; they must agree on shape and dtype
+    """
+    config = config or ValidationConfig()
+    report = {"status": "VALIDATED", "checks": []}
+
+    def record(name, ok, msg, strict):
+        report["checks"].append({"name": name, "ok": bool(ok), "msg": msg, "strict": strict})
+        if not ok:
+            report["status"] = "NOT VALIDATED"
+
+    nt, nc, nz, ny, nx = plan.shape
+
+    # planes of different shape or dtype cannot be stacked at all
+    odd = [l for l in layouts if l["shape"] != (ny, nx) or l["dtype"] != plan.dtype]
+    record("Headers", not odd,
+           f"{len(layouts) - len(odd)}/{len(layouts)} sampled headers are {ny}x{nx} {plan.dtype}",
+           True)
+
+    expected = nt * nc * nz * len(plan.positions)
+    record("Planes", plan.tiff_count == expected,
+           f"files={plan.tiff_count} T*C*Z*positions={expected}",
+           config.strict_dimensions)
+
+    if xml_meta:
+        size_x, size_y = xml_meta.get("SizeX"), xml_meta.get("SizeY")
+        if config.allow_axis_permutation and (size_x, size_y) == (ny, nx) and nx != ny:
+            record("SizeXY", True, f"xml={size_x}x{size_y} plan={nx}x{ny} (X/Y swapped)",
+                   config.strict_dimensions)
+        else:
+            for name, xml, planned in (("SizeX", size_x, nx), ("SizeY", size_y, ny)):
+                if xml is not None:
+                    record(name, xml == planned, f"xml={xml} plan={planned}", config.strict_dimensions)
+
+        if xml_meta.get("SizeZ") is not None:
+            record("SizeZ", xml_meta["SizeZ"] == nz,
+                   f"xml={xml_meta['SizeZ']} plan={nz}", config.strict_dimensions)
+        if xml_meta.get("SizeT") is not None:
+            record("SizeT", xml_meta["SizeT"] == nt,
+                   f"xml={xml_meta['SizeT']} plan={nt}", config.strict_time)
+
+        xml_chan_count = len(xml_meta.get("Channels") or [])
+        if xml_chan_count:
+            record("Channels", xml_chan_count == nc,
+                   f"xml={xml_chan_count} plan={nc}", config.strict_channels)
+
+    return report
+
+
+def rejected_checks(report):
+    """Failed checks that are fatal under the config the report was built with."""
+    return [c for c in report["checks"] if not c["ok"] and c.get("strict")]
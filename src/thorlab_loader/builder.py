@@ -1,65 +1,175 @@
 # src/thorlab_loader/builder.py
+from itertools import chain
 from pathlib import Path
-from typing import List, Tuple, Union
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 import numpy as np
 import math
 import pandas as pd
 import logging
 
-from ylabcommon.utils import find_tiff_files, log_info, log_warn
-from .xml_parser import ExperimentXMLParser
-from .metadata import ThorlabMetadata
-from .tiff_reader import read_stack
-from .tiff_writer import save_ome_tiff, save_plain_tiff
+from ylabcommon.utils import log_info, log_warn
+from .experiment_context import experiment_context
+from .metadata import ThorlabMetadata, FileGroup
+from .infile_pattern import iter_tiff_files
+from .tiff_reader import read_stack, lazy_stack, iter_planes, probe_image
+from .tiff_writer import (
+    save_ome_tiff,
+    save_plain_tiff,
+    save_ome_tiff_stream,
+    save_plain_tiff_stream,
+    save_ome_tiff_pyramid,
+    save_ome_tiff_series,
+    save_dual_tiff,
+    iter_yx_planes,
+)
+from .zarr_writer import save_ome_zarr
+from .manifest import ConversionManifest, atomic_outputs, input_fingerprint
+from .cache import ConversionCache, DEFAULT_CACHE_SIZE
+from .dataset_index import DatasetIndex
+from .expected_files import plan_expected_files
 
 logger = logging.getLogger(__name__)
 
+OUTPUT_FORMATS = ("ome-tiff", "ome-zarr")
+HYPERSTACK_MODES = ("position", "series")
+
+
+def _tee_into(items: Iterable, out: list) -> Iterator:
+    """Yield items unchanged, appending each to `out` as it passes."""
+    for item in items:
+        out.append(item)
+        yield item
+
 
 class ThorlabBuilder:
     """
     Usage:
-      b = ThorlabBuilder(tiff_dir, xml_path)
+      b = ThorlabBuilder(tiff_dir, xml_path, workers=8)
       saved = b.run_and_save(output_dir, save_raw=True)
+
+    workers: number of threads used to decode the planes of a group.
+    memmap:  read uncompressed contiguous TIFFs through np.memmap views
+             instead of the decoder (compressed files are still decoded).
+    lazy:    build_stack_for_group returns a dask array with one delayed
+             chunk per source file instead of a numpy stack.
+    cache_dir: content-addressed cache of converted groups shared between
+             output directories; hits are reflinked or copied instead of
+             recomputed.
+    cache_size: cache size cap in bytes (least recently used entries are
+             evicted first).
+    cache_hardlink: hardlink cache hits instead (outputs then share their
+             inode with the cache entry; do not edit them in place).
+    use_index: keep a persistent index of the TIFF directory (parsed names
+             and header facts); later runs only re-read files whose stat
+             changed. Stored under tiff_dir/.thorlab, or cache_dir/index.
+    plan_from_xml: derive the expected ChanX_sx_sy_z_t files from
+             Experiment.xml; missing planes are reported before any pixel is
+             read.
+    positions: (stage_x, stage_y) list for plan_from_xml; with it the plan is
+             checked with stat calls only. Learned from a directory listing
+             when None.
+    digits:  zero padding of the file indices for plan_from_xml (probed from
+             the first and last planes when None).
     """
 
-    def __init__(self, tiff_dir: str, xml_path: str):
+    def __init__(
+        self,
+        tiff_dir: str,
+        xml_path: str,
+        workers: int = 1,
+        memmap: bool = False,
+        lazy: bool = False,
+        cache_dir: Optional[str] = None,
+        cache_size: Optional[int] = DEFAULT_CACHE_SIZE,
+        cache_hardlink: bool = False,
+        use_index: bool = False,
+        plan_from_xml: bool = False,
+        positions: Optional[List[Tuple[int, int]]] = None,
+        digits: Optional[int] = None,
+    ):
         self.tiff_dir = Path(tiff_dir)
         self.xml_path = Path(xml_path)
+        self.workers = max(1, int(workers))
+        self.memmap = memmap
+        self.lazy = lazy
+        self.cache = (
+            ConversionCache(cache_dir, cache_size, hardlink=cache_hardlink) if cache_dir else None
+        )
 
         if not self.xml_path.exists():
             raise FileNotFoundError("Experiment.xml is required but not found.")
 
-        # Parse XML
-        self.xml_meta = ExperimentXMLParser(str(self.xml_path)).extract_metadata()
-
-        # Discover TIFF files
-        all_tiffs = find_tiff_files(str(self.tiff_dir))
-        if not self.tiff_dir:
-            raise FileNotFoundError(f"No TIFF files found in folder {tiff_dir}.")
-        log_info(f"Found {len(all_tiffs)} TIFF files in {self.tiff_dir}")
-        
-       # Skip malformed TIFFs (like Stack.tif)
-        self.tiff_files = [
-            f for f in all_tiffs
-            if ("Chan" in Path(f).name or "CH" in Path(f).name)
-        ]
-
-        skipped = len(all_tiffs) - len(self.tiff_files)
+        # Parse XML (once per file and mtime, shared with other builders)
+        self.context = experiment_context(self.xml_path)
+        self.xml_meta = self.context.xml_meta
 
-        log_info(f"Loaded {len(self.tiff_files)} valid Chan* TIFF files")
-        if skipped > 0:
-            log_warn(f"Skipped {skipped} non-standard TIFF files")
-
-        if not self.tiff_files:
-            raise FileNotFoundError("No valid Chan*.tif files found in folder.")
-
-        # Build metadata table
-        self.meta = ThorlabMetadata(self.xml_meta, self.tiff_files)
+        self.index = None
+        self.plan = None
+        if plan_from_xml:
+            self.plan = plan_expected_files(
+                self.tiff_dir, self.xml_meta,
+                positions=positions, digits=digits, workers=max(16, self.workers),
+            )
+            self.tiff_files = self.plan.present
+            log_info(
+                f"Planned {len(self.plan.expected)} files from Experiment.xml, "
+                f"found {len(self.tiff_files)} in {self.tiff_dir}"
+            )
+            if self.plan.missing:
+                log_warn(
+                    f"{len(self.plan.missing)} expected file(s) missing, "
+                    f"e.g. {self.plan.missing[:5]}"
+                )
+            if not self.tiff_files:
+                raise FileNotFoundError("No expected Chan*.tif files found in folder.")
+            self.meta = ThorlabMetadata(self.xml_meta, self.tiff_files)
+        elif use_index:
+            # persisted listing, parsed keys and headers; refreshed incrementally
+            index_dir = Path(cache_dir) / "index" if cache_dir else None
+            self.index = DatasetIndex(self.tiff_dir, index_dir, workers=max(8, self.workers)).refresh()
+            self.tiff_files = self.index.paths()
+            log_info(f"Indexed {len(self.index.names)} TIFF files in {self.tiff_dir}")
+            log_info(f"Loaded {len(self.tiff_files)} valid Chan* TIFF files")
+            if not self.tiff_files:
+                raise FileNotFoundError("No valid Chan*.tif files found in folder.")
+            self.meta = self.index.metadata(self.xml_meta)
+        else:
+            # Discover TIFF files (recursive scandir, Thorlabs names filtered as
+            # they arrive; malformed TIFFs like Stack.tif are never stat'ed) and
+            # parse them into the metadata table while the listing streams in
+            skipped = []
+            stream = iter_tiff_files(str(self.tiff_dir), rejected=skipped, recursive=True)
+            first = next(stream, None)
+            if first is None:
+                raise FileNotFoundError("No valid Chan*.tif files found in folder.")
+
+            self.tiff_files = []
+            self.meta = ThorlabMetadata(self.xml_meta, _tee_into(chain([first], stream), self.tiff_files))
+
+            log_info(f"Found {len(self.tiff_files) + len(skipped)} TIFF files in {self.tiff_dir}")
+            log_info(f"Loaded {len(self.tiff_files)} valid Chan* TIFF files")
+            if skipped:
+                log_warn(f"Skipped {len(skipped)} non-standard TIFF files")
 
         # Validate integrity (new function)
         self.meta.validate_integrity()
         log_info("XML integrity check passed (basic)")
 
+    @property
+    def pixel_size(self):
+        """(Z, Y, X) pixel size in µm from Experiment.xml (None where unknown)."""
+        return (
+            self.xml_meta.get("PixelSizeZ"),
+            self.xml_meta.get("PixelSizeY"),
+            self.xml_meta.get("PixelSizeX"),
+        )
+
+    def probe(self, path: str):
+        """((Y, X), dtype) of a source file, from the dataset index when enabled."""
+        if self.index is not None:
+            return self.index.header(path)
+        return probe_image(path)
+
     # ----------------------------
     # Metadata grouping
     # ----------------------------
@@ -75,11 +185,25 @@ class ThorlabBuilder:
     # Image stacking
     # ----------------------------
 
-    def build_stack_for_group(self, df_group: pd.DataFrame):
+    def build_stack_for_group(self, df_group: FileGroup):
         paths = df_group["path"].tolist()
-        stack = read_stack(paths)  # Shape: (Z, Y, X)
+        if self.lazy:
+            # Lazy (Z, Y, X) dask array, one chunk per file
+            return lazy_stack(paths, memmap=self.memmap)
+        # Preallocated (Z, Y, X); each file is decoded into its own slice
+        stack = read_stack(paths, workers=self.workers, memmap=self.memmap)
         return stack
 
+    def stream_planes_for_group(self, df_group: FileGroup):
+        """
+        Return ((Z, Y, X) shape, dtype, plane iterator) for a group without
+        building the stack. Only the first file's header is read up front.
+        """
+        paths = df_group["path"].tolist()
+        (ny, nx), dtype = self.probe(paths[0])
+        planes = iter_planes(paths, workers=self.workers, memmap=self.memmap)
+        return (len(paths), ny, nx), dtype, planes
+
     # ----------------------------
     # Output name builder
     # ----------------------------
@@ -122,13 +246,8 @@ class ThorlabBuilder:
         sy_i = self._validate_and_cast("StageY", sy)
         t_i = self._validate_and_cast("T", t)
 
-        zvals = (
-            df_group["z"]
-            .dropna()
-            .astype(int)
-            .sort_values()
-            .unique()
-        )
+        # df_group: metadata FileGroup (numpy columns) or a DataFrame
+        zvals = np.unique(pd.Series(df_group["z"]).dropna().to_numpy(dtype=np.int64))
 
         if len(zvals) == 0:
             zpart = "Zsingle"
@@ -143,11 +262,85 @@ class ThorlabBuilder:
     # Main processing loop
     # ----------------------------
 
-    def run_and_save(self, output_dir: str, save_raw: bool = False) -> List[str]:
+    def run_and_save(
+        self,
+        output_dir: str,
+        save_raw: bool = False,
+        stream: bool = False,
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None,
+        predictor: bool = False,
+        pyramid: bool = False,
+        output_format: str = "ome-tiff",
+        hyperstack: Optional[str] = None,
+        resume: bool = False,
+    ) -> List[str]:
+        """
+        Write one OME-TIFF / OME-Zarr (and optionally a plain TIFF) per group.
+
+        stream:      write page by page from the source files instead of building
+                     the (Z, Y, X) stack first; peak memory is about one plane per
+                     reader thread regardless of Z depth.
+        compression: "zlib", "zstd" or "lzw" (default: uncompressed), with an
+                     optional level and horizontal predictor. Strips are encoded
+                     on `workers` threads.
+        pyramid:     write tiled OME-TIFFs with 2x downsampled SubIFD levels.
+        output_format: "ome-tiff" or "ome-zarr" (chunked, sharded, written by
+                     `workers` threads; needs the 'zarr' extra). Zarr accepts
+                     zstd, lz4 or zlib compression.
+        hyperstack:  None (one file per group), "position" (one TCZYX OME-TIFF
+                     per stage position) or "series" (all positions as OME
+                     series of a single file). Planes are streamed in T, C, Z
+                     order, so no TCZYX array is built in memory.
+        resume:      skip groups (or hyperstack files) recorded as finished in
+                     the output manifest whose input files (path, size,
+                     mtime) and options are unchanged and whose outputs
+                     still exist.
+
+        Outputs are written to a staging directory inside output_dir and
+        renamed into place once complete, so an interrupted run never leaves
+        half-written files behind.
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, got '{output_format}'")
+        if hyperstack is not None:
+            if hyperstack not in HYPERSTACK_MODES:
+                raise ValueError(f"hyperstack must be one of {HYPERSTACK_MODES}, got '{hyperstack}'")
+            if output_format != "ome-tiff" or pyramid:
+                raise ValueError("hyperstack output is written as plain (non-pyramid) OME-TIFF only")
+
         out_dir = Path(output_dir)
         out_dir.mkdir(parents=True, exist_ok=True)
         saved = []
 
+        write_opts = dict(
+            compression=compression,
+            compression_level=compression_level,
+            predictor=predictor,
+            maxworkers=self.workers if compression else None,
+        )
+
+        # also clears staging dirs left by a killed run
+        manifest = ConversionManifest(out_dir)
+
+        # options that change the output files (not how fast they are written)
+        options = dict(
+            save_raw=save_raw,
+            compression=compression,
+            compression_level=compression_level,
+            predictor=predictor,
+            pyramid=pyramid,
+            output_format=output_format,
+        )
+
+        if hyperstack is not None:
+            if save_raw:
+                log_warn("save_raw is ignored in hyperstack mode")
+            options = dict(options, save_raw=False, hyperstack=hyperstack)
+            return self._write_hyperstacks(out_dir, hyperstack, write_opts, manifest, options, resume)
+
+        skipped = 0
+
         for group_key, df_group in self.groups():
             ch, sx, sy, t = group_key
 
@@ -158,20 +351,201 @@ class ThorlabBuilder:
                 )
                 continue
 
-            stack = self.build_stack_for_group(df_group)
-
             base = self.build_output_name(group_key, df_group)
+            fingerprint = input_fingerprint(df_group["path"].tolist())
+
+            if resume:
+                done = manifest.completed(base, fingerprint, options)
+                if done is not None:
+                    saved.extend(done)
+                    skipped += 1
+                    continue
+
+            cache_key = None
+            if self.cache is not None:
+                cache_key = self.cache.key(
+                    fingerprint, self.xml_path, {"builder": "thorlab", "name": base, **options}
+                )
+
+            with atomic_outputs(out_dir) as staging:
+                written = self.cache.fetch(cache_key, staging) if cache_key else None
+                if written is None:
+                    written = self._write_group(
+                        df_group, staging, base,
+                        save_raw=save_raw,
+                        stream=stream,
+                        pyramid=pyramid,
+                        output_format=output_format,
+                        write_opts=write_opts,
+                    )
+                    if cache_key:
+                        self.cache.store(cache_key, written)
+                else:
+                    log_info(f"[CACHE] {base} linked from {self.cache.cache_dir}")
+            written = [str(out_dir / Path(p).name) for p in written]
+            manifest.record(base, fingerprint, options, written)
+            saved.extend(written)
+
+        if skipped:
+            log_info(f"Resumed: {skipped} finished group(s) skipped")
+
+        return saved
+
+    # ----------------------------
+    # Hyperstack output
+    # ----------------------------
+
+    def hyperstack_plans(self):
+        """
+        [((stage_x, stage_y), (T, C, Z, Y, X), dtype, paths)] per stage position,
+        paths in T, C, Z order. Only one TIFF header per position is read.
+        """
+        plans = []
+        for sx, sy in self.meta.positions():
+            (nt, nc, nz), paths = self.meta.hyperstack(sx, sy)
+            (ny, nx), dtype = self.probe(paths[0])
+            plans.append(((sx, sy), (nt, nc, nz, ny, nx), dtype, paths))
+        return plans
+
+    def _write_hyperstacks(
+        self,
+        out_dir: Path,
+        mode: str,
+        write_opts: dict,
+        manifest: ConversionManifest,
+        options: dict,
+        resume: bool,
+    ) -> List[str]:
+        """
+        Write the hyperstack file(s) of `mode`; like groups, each file is
+        staged, recorded in the manifest and skipped on resume when finished.
+        """
+        plans = self.hyperstack_plans()
+        opts = dict(channel_names=self.meta.channel_names(), pixel_size=self.pixel_size, **write_opts)
+
+        # (output base name, source paths, writer of the output path)
+        jobs = []
+        if mode == "position":
+            for (sx, sy), shape, dtype, paths in plans:
+                def write(path, shape=shape, dtype=dtype, paths=paths):
+                    planes = iter_planes(paths, workers=self.workers, memmap=self.memmap)
+                    save_ome_tiff_stream(planes, path, shape, dtype, **opts)
+
+                jobs.append((f"Output_hyperstack_{sx:03d}_{sy:03d}", paths, write))
+        else:
+            dtypes = {np.dtype(dtype) for _, _, dtype, _ in plans}
+            if len(dtypes) != 1:
+                raise ValueError(f"Stage positions have different dtypes: {dtypes}")
+            dtype = dtypes.pop()
+
+            def write(path):
+                series = [
+                    (
+                        f"Position_{sx:03d}_{sy:03d}",
+                        shape,
+                        iter_planes(paths, workers=self.workers, memmap=self.memmap),
+                    )
+                    for (sx, sy), shape, _, paths in plans
+                ]
+                save_ome_tiff_series(series, path, dtype, **opts)
+
+            all_paths = [p for _, _, _, paths in plans for p in paths]
+            jobs.append(("Output_hyperstack_all_positions", all_paths, write))
+
+        saved = []
+        skipped = 0
+        for base, paths, write in jobs:
+            fingerprint = input_fingerprint(paths)
+            if resume:
+                done = manifest.completed(base, fingerprint, options)
+                if done is not None:
+                    saved.extend(done)
+                    skipped += 1
+                    continue
+
+            name = f"{base}.ome.tif"
+            with atomic_outputs(out_dir) as staging:
+                write(str(staging / name))
+            manifest.record(base, fingerprint, options, [name])
+            saved.append(str(out_dir / name))
+
+        if skipped:
+            log_info(f"Resumed: {skipped} finished hyperstack file(s) skipped")
+        return saved
 
+    def _write_group(
+        self,
+        df_group: FileGroup,
+        out_dir: Path,
+        base: str,
+        save_raw: bool,
+        stream: bool,
+        pyramid: bool,
+        output_format: str,
+        write_opts: dict,
+    ) -> List[str]:
+        """
+        Write the outputs of one group; returns the written paths.
+        """
+        written = []
+        stack = None if stream else self.build_stack_for_group(df_group)
+        # lazy (dask) stacks are written plane by plane like streamed groups,
+        # so only the planes in flight are ever computed
+        by_plane = stream or not isinstance(stack, np.ndarray)
+
+        if output_format == "ome-zarr":
+            # chunks are read block by block from the lazy stack when streaming
+            zarr_path = out_dir / f"{base}.ome.zarr"
+            data = lazy_stack(df_group["path"].tolist(), memmap=self.memmap) if stream else stack
+            save_ome_zarr(
+                data, str(zarr_path),
+                pixel_size=self.pixel_size,
+                compression=write_opts["compression"],
+                compression_level=write_opts["compression_level"],
+                workers=self.workers,
+            )
+            written.append(str(zarr_path))
+        else:
             # OME-TIFF output
             ome_path = out_dir / f"{base}.ome.tif"
-            save_ome_tiff(stack, str(ome_path))
-            saved.append(str(ome_path))
-
-            # Optional raw TIFF
-            if save_raw:
+            if stream:
+                # one plane in memory at a time
+                shape, dtype, planes = self.stream_planes_for_group(df_group)
+            else:
+                shape, dtype = stack.shape, stack.dtype
+                planes = iter_yx_planes(stack)
+
+            if save_raw and not pyramid:
+                # both files from one read and one encode of every plane
                 raw_path = out_dir / f"{base}.tif"
-                save_plain_tiff(stack, str(raw_path))
-                saved.append(str(raw_path))
+                save_dual_tiff(planes, str(ome_path), str(raw_path), shape, dtype, **write_opts)
+                return [str(ome_path), str(raw_path)]
 
-        return saved
+            if pyramid:
+                save_ome_tiff_pyramid(
+                    planes, str(ome_path), shape, dtype,
+                    pixel_size=self.pixel_size, **write_opts,
+                )
+            elif by_plane:
+                save_ome_tiff_stream(planes, str(ome_path), shape, dtype, **write_opts)
+            else:
+                save_ome_tiff(stack, str(ome_path), **write_opts)
+            written.append(str(ome_path))
+
+        # Optional raw TIFF (Zarr or pyramid output, whose layout differs)
+        if save_raw:
+            raw_path = out_dir / f"{base}.tif"
+            if stream:
+                # second pass over the source files
+                shape, dtype, planes = self.stream_planes_for_group(df_group)
+                save_plain_tiff_stream(planes, str(raw_path), shape, dtype, **write_opts)
+            elif by_plane:
+                save_plain_tiff_stream(
+                    iter_yx_planes(stack), str(raw_path), stack.shape, stack.dtype, **write_opts
+                )
+            else:
+                save_plain_tiff(stack, str(raw_path), **write_opts)
+            written.append(str(raw_path))
+
+        return written
 
@@ -0,0 +1,238 @@
+# src/thorlab_loader/cache.py
+"""
+Content-addressed cache of converted outputs, shared between output directories.
+
+An entry is keyed by sha256 over the input fingerprint (paths, sizes, mtimes),
+the Experiment.xml contents and the writer options. Hits are reflinked into
+the output directory (copied where the filesystem has no reflinks), so
+reconverting the same acquisition costs no pixel work.
+
+Hardlinks are opt-in (hardlink=True): they are free on any filesystem, but
+the output then shares its inode with the cache entry, so editing an output
+in place would silently change the cached copy too. This package only ever
+replaces outputs by rename. Entries are evicted least-recently-used first
+once the cache exceeds `max_bytes`; a running total (size.json) is kept so
+the entries are only walked when the cap is crossed.
+"""
+
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import List, Optional
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from .manifest import atomic_outputs
+
+DEFAULT_CACHE_SIZE = 100 * 2**30
+ENTRY_NAME = "entry.json"
+SIZE_NAME = "size.json"
+
+# Linux FICLONE ioctl (btrfs, xfs, ...)
+_FICLONE = 0x40049409
+
+
+@lru_cache(maxsize=64)
+def _file_sha256(path: str, size: int, mtime_ns: int) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _reflink(src: str, dst: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, "rb") as fs, open(dst, "wb") as fd:
+        try:
+            fcntl.ioctl(fd.fileno(), _FICLONE, fs.fileno())
+            return True
+        except OSError:
+            pass
+    os.unlink(dst)
+    return False
+
+
+def _link_file(src: str, dst: str, hardlink: bool = False) -> str:
+    """
+    Reflink src to dst, falling back to a copy; with hardlink=True a
+    hardlink is tried first.
+    """
+    if hardlink:
+        try:
+            os.link(src, dst)
+            return dst
+        except OSError:
+            pass
+    if not _reflink(src, dst):
+        shutil.copy2(src, dst)
+    return dst
+
+
+def _link_tree(src: Path, dst: Path, hardlink: bool = False):
+    if src.is_dir():
+        shutil.copytree(src, dst, copy_function=partial(_link_file, hardlink=hardlink))
+    else:
+        _link_file(str(src), str(dst), hardlink)
+
+
+def _tree_size(path: Path) -> int:
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size
+
+
+class ConversionCache:
+    """
+    Directory of converted outputs keyed by key().
+
+    hardlink: share inodes between outputs and entries instead of
+              reflinking / copying (see the module docstring)
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: Optional[int] = DEFAULT_CACHE_SIZE,
+        hardlink: bool = False,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hardlink = hardlink
+
+    def key(self, fingerprint: str, xml_path: Optional[str], options: dict) -> str:
+        """
+        sha256 over the input fingerprint, Experiment.xml contents and options.
+        """
+        xml_hash = None
+        if xml_path:
+            st = os.stat(xml_path)
+            xml_hash = _file_sha256(str(xml_path), st.st_size, st.st_mtime_ns)
+        payload = json.dumps(
+            {"inputs": fingerprint, "xml": xml_hash, "options": options},
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def fetch(self, key: str, out_dir: Path) -> Optional[List[str]]:
+        """
+        Reflink / copy (or hardlink) the cached outputs of `key` into out_dir and return their paths,
+        or None on a miss.
+        """
+        entry = self._entry_dir(key)
+        try:
+            info = json.loads((entry / ENTRY_NAME).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+        out_dir = Path(out_dir)
+        with atomic_outputs(out_dir) as staging:
+            for name in info["outputs"]:
+                _link_tree(entry / name, staging / name, self.hardlink)
+
+        # mark as recently used
+        os.utime(entry / ENTRY_NAME)
+        return [str(out_dir / name) for name in info["outputs"]]
+
+    def store(self, key: str, paths: List[str]):
+        """
+        Add finished outputs under `key` (linked like fetch()), then evict.
+        """
+        entry = self._entry_dir(key)
+        if (entry / ENTRY_NAME).exists():
+            return
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        tmp = Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir))
+        try:
+            names = []
+            for p in paths:
+                src = Path(p)
+                _link_tree(src, tmp / src.name, self.hardlink)
+                names.append(src.name)
+            info = {
+                "outputs": names,
+                "bytes": sum(_tree_size(tmp / n) for n in names),
+                "created": time.time(),
+            }
+            (tmp / ENTRY_NAME).write_text(json.dumps(info), encoding="utf-8")
+            # read (or rebuild) the total before the new entry is visible
+            total = self.total_bytes() + info["bytes"]
+            try:
+                os.replace(tmp, entry)
+            except OSError:
+                # stored concurrently by another run
+                return
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        self._write_total(total)
+        if self.max_bytes is not None and total > self.max_bytes:
+            self.evict()
+
+    def _write_total(self, total: int):
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"bytes": int(total)}, f)
+            os.replace(tmp, self.cache_dir / SIZE_NAME)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def total_bytes(self) -> int:
+        """
+        Running size of all entries, from size.json (the entries are walked
+        once when it is missing or unreadable).
+        """
+        try:
+            info = json.loads((self.cache_dir / SIZE_NAME).read_text(encoding="utf-8"))
+            return int(info["bytes"])
+        except (OSError, ValueError, KeyError, TypeError):
+            total = sum(size for _, size, _ in self.entries())
+            self._write_total(total)
+            return total
+
+    def entries(self):
+        """
+        [(last_used, bytes, entry_dir)] of every complete entry.
+        """
+        found = []
+        for meta in self.cache_dir.glob(f"*/*/{ENTRY_NAME}"):
+            try:
+                info = json.loads(meta.read_text(encoding="utf-8"))
+                found.append((meta.stat().st_mtime, int(info["bytes"]), meta.parent))
+            except (OSError, ValueError, KeyError):
+                continue
+        return found
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Remove least-recently-used entries until the cache fits max_bytes;
+        returns the number of bytes freed. Walks every entry and resets the
+        running total (correcting drift from concurrent runs).
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        if limit is None:
+            return 0
+        found = sorted(self.entries())
+        total = sum(size for _, size, _ in found)
+        freed = 0
+        for _, size, path in found:
+            if total <= limit:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            freed += size
+        self._write_total(total)
+        return freed
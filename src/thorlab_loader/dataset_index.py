@@ -0,0 +1,305 @@
+# src/thorlab_loader/dataset_index.py
+"""
+Persistent index of a Thorlabs TIFF directory.
+
+For every TIFF the sidecar stores the stat (size, mtime), the keys parsed
+from the file name (channel, stage_x, stage_y, z, t) and the first-page
+header facts (shape, dtype, compression, data offset / bytes, strips).
+Subdirectories are walked like default discovery (iter_tiff_files with
+recursive=True; hidden ones such as .thorlab are skipped) and files are
+stored by their path relative to tiff_dir. On refresh the tree is only
+listed again when the mtime of one of its directories changed, and only
+files whose stat changed (or that are new) are parsed and probed.
+
+The sidecar is <tiff_dir>/.thorlab/index.npz (a subdirectory, so rewriting
+it does not touch the data directory's mtime), or <index_dir>/<hash>.npz
+when the data directory is read-only or shared.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from .infile_pattern import INDEX_FIELDS, TIFF_SUFFIXES, parse_filenames
+from .metadata import ThorlabMetadata
+from .tiff_reader import probe_layout
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUBDIR = ".thorlab"
+INDEX_NAME = "index.npz"
+INDEX_VERSION = 2
+
+INDEX_DTYPE = np.dtype(
+    [
+        ("size", np.int64),
+        ("mtime_ns", np.int64),
+        ("channel", np.int16),      # code into channels, -1: name not matched
+        ("stage_x", np.int32),
+        ("stage_y", np.int32),
+        ("z", np.int32),
+        ("t", np.int32),
+        ("height", np.int32),       # -1: header could not be read
+        ("width", np.int32),
+        ("dtype", np.int16),        # code into dtypes
+        ("compression", np.int32),
+        ("dataoffset", np.int64),
+        ("databytes", np.int64),
+        ("n_strips", np.int32),
+    ]
+)
+
+
+def _stat(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _probe(path: str) -> Optional[dict]:
+    try:
+        return probe_layout(path)
+    except Exception as e:
+        logger.warning(f"Cannot read TIFF header of {path}: {e}")
+        return None
+
+
+class DatasetIndex:
+    """
+    Usage:
+      idx = DatasetIndex(tiff_dir).refresh()
+      paths = idx.paths()                # parsed Thorlabs planes, sorted
+      (ny, nx), dtype = idx.header(paths[0])
+    """
+
+    def __init__(self, tiff_dir: str, index_dir: Optional[str] = None, workers: int = 8):
+        self.tiff_dir = Path(tiff_dir)
+        self.workers = max(1, int(workers))
+        if index_dir:
+            digest = hashlib.sha1(str(self.tiff_dir.resolve()).encode()).hexdigest()[:16]
+            self.index_path = Path(index_dir) / f"{digest}.npz"
+        else:
+            self.index_path = self.tiff_dir / INDEX_SUBDIR / INDEX_NAME
+
+        self.names: List[str] = []
+        self.files = np.empty(0, dtype=INDEX_DTYPE)
+        self.channels: List[str] = []
+        self.dtypes: List[str] = []
+        self.dir_mtimes: Dict[str, int] = {}
+        self._rows: Optional[Dict[str, int]] = None
+
+    # ----------------------------
+    # Persistence
+    # ----------------------------
+
+    def _load(self) -> bool:
+        try:
+            with np.load(self.index_path, allow_pickle=False) as z:
+                info = json.loads(str(z["info"]))
+                if info.get("version") != INDEX_VERSION:
+                    return False
+                names = str(z["names"])
+                self.names = names.split("\n") if names else []
+                self.files = z["files"]
+                self.channels = z["channels"].tolist()
+                self.dtypes = z["dtypes"].tolist()
+                self.dir_mtimes = info["dir_mtimes"]
+        except (OSError, ValueError, KeyError):
+            return False
+        return len(self.names) == len(self.files)
+
+    def save(self):
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        info = {"version": INDEX_VERSION, "dir_mtimes": self.dir_mtimes}
+        fd, tmp = tempfile.mkstemp(prefix=".index-", suffix=".npz", dir=self.index_path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    info=np.array(json.dumps(info)),
+                    names=np.array("\n".join(self.names)),
+                    files=self.files,
+                    channels=np.array(self.channels, dtype=str),
+                    dtypes=np.array(self.dtypes, dtype=str),
+                )
+            os.replace(tmp, self.index_path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    # ----------------------------
+    # Refresh
+    # ----------------------------
+
+    def _list_dir(self) -> Tuple[List[str], Dict[str, int]]:
+        """
+        (sorted relative TIFF names, {relative dir: mtime_ns}) of the tree,
+        walked like iter_tiff_files(recursive=True).
+        """
+        names, dir_mtimes = [], {}
+        pending = [""]
+        while pending:
+            rel = pending.pop()
+            path = self.tiff_dir / rel
+            # stat before listing, so later changes are seen by the next refresh
+            dir_mtimes[rel] = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                for e in it:
+                    name = f"{rel}/{e.name}" if rel else e.name
+                    if e.name.lower().endswith(TIFF_SUFFIXES):
+                        if e.is_file():
+                            names.append(name)
+                    elif not e.name.startswith(".") and e.is_dir(follow_symlinks=False):
+                        pending.append(name)
+        return sorted(names), dir_mtimes
+
+    def _dirs_changed(self) -> bool:
+        for rel, mtime_ns in self.dir_mtimes.items():
+            try:
+                if os.stat(self.tiff_dir / rel).st_mtime_ns != mtime_ns:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _code(self, table: List[str], value: str) -> int:
+        if value not in table:
+            table.append(value)
+        return table.index(value)
+
+    def refresh(self, save: bool = True) -> "DatasetIndex":
+        """
+        Bring the index up to date with the directory; returns self.
+        The sidecar is rewritten only if something changed.
+        """
+        if save:
+            # create the sidecar directory before reading the data dir mtime
+            try:
+                self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            except OSError:
+                pass
+        loaded = self._load()
+        old_rows = {n: i for i, n in enumerate(self.names)} if loaded else {}
+        old_files = self.files if loaded else np.empty(0, dtype=INDEX_DTYPE)
+
+        listed = not loaded or self._dirs_changed()
+        if listed:
+            names, dir_mtimes = self._list_dir()
+        else:
+            names, dir_mtimes = list(self.names), self.dir_mtimes
+
+        paths = [str(self.tiff_dir / n) for n in names]
+        with ThreadPoolExecutor(max_workers=self.workers) as exe:
+            stats = list(exe.map(_stat, paths))
+
+        keep = [i for i, st in enumerate(stats) if st is not None]
+        names = [names[i] for i in keep]
+        files = np.zeros(len(names), dtype=INDEX_DTYPE)
+
+        stale = []
+        for j, i in enumerate(keep):
+            size, mtime_ns = stats[i]
+            row = old_rows.get(names[j])
+            if row is not None and old_files[row]["size"] == size and old_files[row]["mtime_ns"] == mtime_ns:
+                files[j] = old_files[row]
+            else:
+                files[j]["size"] = size
+                files[j]["mtime_ns"] = mtime_ns
+                stale.append(j)
+
+        if stale:
+            self._index_files(files, names, stale)
+
+        changed = bool(stale) or len(names) != len(self.names) or listed
+        self.names, self.files, self.dir_mtimes = names, files, dir_mtimes
+        self._rows = None
+
+        if stale or len(old_rows) != len(names):
+            logger.info(
+                f"Dataset index {self.tiff_dir}: {len(stale)} new/changed, "
+                f"{len(names)} files"
+            )
+        if save and changed:
+            try:
+                self.save()
+            except OSError as e:
+                logger.warning(f"Cannot write dataset index {self.index_path}: {e}")
+        return self
+
+    def _index_files(self, files: np.ndarray, names: List[str], rows: List[int]):
+        """
+        Parse names and probe headers of files[rows] in place.
+        """
+        parsed = parse_filenames([names[j] for j in rows])
+        matched = parsed["channel"].notna().to_numpy()
+
+        todo = [j for j, ok in zip(rows, matched) if ok]
+        with ThreadPoolExecutor(max_workers=self.workers) as exe:
+            layouts = dict(zip(todo, exe.map(_probe, [str(self.tiff_dir / names[j]) for j in todo])))
+
+        for k, j in enumerate(rows):
+            rec = files[j]
+            if not matched[k]:
+                rec["channel"] = -1
+                rec["height"] = -1
+                continue
+            rec["channel"] = self._code(self.channels, parsed["channel"].iloc[k])
+            for col in INDEX_FIELDS:
+                rec[col] = int(parsed[col].iloc[k])
+
+            layout = layouts[j]
+            if layout is None:
+                rec["height"] = -1
+                continue
+            rec["height"], rec["width"] = layout["shape"]
+            rec["dtype"] = self._code(self.dtypes, layout["dtype"].str)
+            for col in ("compression", "dataoffset", "databytes", "n_strips"):
+                rec[col] = layout[col]
+
+    # ----------------------------
+    # Queries
+    # ----------------------------
+
+    def _valid(self) -> np.ndarray:
+        return (self.files["channel"] >= 0) & (self.files["height"] >= 0)
+
+    def paths(self) -> List[str]:
+        """Sorted paths of the files with a Thorlabs name and a readable header."""
+        return [str(self.tiff_dir / self.names[i]) for i in np.flatnonzero(self._valid())]
+
+    def layout(self, path: str) -> dict:
+        """Indexed header facts of a file, like tiff_reader.probe_layout."""
+        if self._rows is None:
+            self._rows = {n: i for i, n in enumerate(self.names)}
+        rec = self.files[self._rows[Path(path).relative_to(self.tiff_dir).as_posix()]]
+        if rec["height"] < 0:
+            raise ValueError(f"No readable TIFF header indexed for {path}")
+        return {
+            "shape": (int(rec["height"]), int(rec["width"])),
+            "dtype": np.dtype(self.dtypes[rec["dtype"]]),
+            **{col: int(rec[col]) for col in ("compression", "dataoffset", "databytes", "n_strips")},
+        }
+
+    def header(self, path: str) -> Tuple[Tuple[int, int], np.dtype]:
+        """((Y, X), dtype) of an indexed file, like tiff_reader.probe_image."""
+        info = self.layout(path)
+        return info["shape"], info["dtype"]
+
+    def metadata(self, xml_meta: Dict) -> ThorlabMetadata:
+        """ThorlabMetadata over the valid files, reusing the parsed keys."""
+        rows = np.flatnonzero(self._valid())
+        return ThorlabMetadata.from_index(
+            xml_meta,
+            [str(self.tiff_dir / self.names[i]) for i in rows],
+            self.channels,
+            self.files[rows],
+        )
@@ -0,0 +1,213 @@
+# src/thorlab_loader/expected_files.py
+"""
+Plan the Thorlabs plane files of an acquisition from Experiment.xml.
+
+Thorlabs names are deterministic (ChanX_sx_sy_z_t.tif), so the expected
+files follow from the XML channel list, SizeZ and SizeT plus the stage
+positions and the zero padding of the indices. When positions are given,
+the padding is learned by stat'ing a few planes of every position and the
+expected files are checked with batched, parallel stat calls; a complete
+flat acquisition is never listed. Otherwise (or when a planned file is not
+found directly in tiff_dir) one recursive os.scandir pass (names only, no
+stat; the same rule as default discovery) learns the layout and locates the
+files wherever they are, so a missing first plane, an irregular position
+grid or planes in subdirectories are handled like a plain run. Either way
+gaps are found before any pixel is read.
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import os
+import re
+
+from .infile_pattern import FILENAME_RE, iter_tiff_files
+
+DEFAULT_DIGITS = 3
+# index paddings tried by the stat probe, most common first
+PROBE_DIGITS = (3, 4)
+_CHANNEL_RE = re.compile(r"^Chan[A-Za-z0-9\-]+$")
+
+
+@dataclass
+class FilePlan:
+    """
+    Expected vs found plane files of one acquisition directory.
+    `extra` is only filled when the directory listing was requested.
+    """
+
+    tiff_dir: Path
+    digits: int
+    positions: List[Tuple[int, int]]
+    expected: List[str] = field(default_factory=list)
+    present: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+    extra: List[str] = field(default_factory=list)
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+
+def file_channels(xml_channels: Sequence[str]) -> List[str]:
+    """
+    File-name channel prefixes for the XML channel list: names already in
+    Thorlabs form (ChanA, ...) are kept, others map to ChanA, ChanB, ... by order.
+    """
+    return [
+        name if _CHANNEL_RE.match(name) else f"Chan{chr(ord('A') + i)}"
+        for i, name in enumerate(xml_channels)
+    ]
+
+
+def expected_filenames(
+    channels: Sequence[str],
+    positions: Sequence[Tuple[int, int]],
+    size_z: int,
+    size_t: int,
+    digits: int = 3,
+    suffix: str = ".tif",
+) -> List[str]:
+    """
+    Every ChanX_sx_sy_z_t name of the acquisition (1-based indices).
+    """
+    return [
+        f"{ch}_{sx:0{digits}d}_{sy:0{digits}d}_{z:0{digits}d}_{t:0{digits}d}{suffix}"
+        for ch in channels
+        for sx, sy in positions
+        for t in range(1, size_t + 1)
+        for z in range(1, size_z + 1)
+    ]
+
+
+def _exists_batch(paths: List[str]) -> List[bool]:
+    return [os.path.isfile(p) for p in paths]
+
+
+def stat_exists(paths: List[str], workers: int = 16, batch: int = 256) -> List[bool]:
+    """
+    os.path.isfile over paths, in batches spread over a thread pool
+    (stat latency on network storage overlaps across threads).
+    """
+    batches = [paths[i:i + batch] for i in range(0, len(paths), batch)]
+    if workers <= 1 or len(batches) <= 1:
+        return [ok for b in batches for ok in _exists_batch(b)]
+    with ThreadPoolExecutor(max_workers=workers) as exe:
+        return [ok for res in exe.map(_exists_batch, batches) for ok in res]
+
+
+def _probe_digits(
+    tiff_dir: Path,
+    channels: Sequence[str],
+    positions: Sequence[Tuple[int, int]],
+    size_z: int,
+    size_t: int,
+    workers: int = 16,
+) -> Optional[int]:
+    """
+    Zero padding of the indices from stat calls only: the first and last
+    plane of every channel and position are checked for each PROBE_DIGITS
+    width, and the width with most hits wins (None if no probed plane exists).
+    """
+    corners = sorted({(1, 1), (size_z, size_t)})
+    probes = {
+        d: [
+            str(tiff_dir / f"{ch}_{sx:0{d}d}_{sy:0{d}d}_{z:0{d}d}_{t:0{d}d}.tif")
+            for ch in channels
+            for sx, sy in positions
+            for z, t in corners
+        ]
+        for d in PROBE_DIGITS
+    }
+    flat = [p for paths in probes.values() for p in paths]
+    found = iter(stat_exists(flat, workers=workers))
+    hits = {d: sum(next(found) for _ in paths) for d, paths in probes.items()}
+    digits = max(hits, key=hits.get)
+    return digits if hits[digits] else None
+
+
+def _scan_layout(
+    tiff_dir: Path, channels: Sequence[str]
+) -> Tuple[Optional[int], List[Tuple[int, int]], Dict[str, str]]:
+    """
+    One recursive os.scandir pass over the Thorlabs-named files under
+    tiff_dir (iter_tiff_files, as in default discovery).
+
+    Returns (digits, positions, found): the most common index width (None
+    if nothing matches), the sorted (stage_x, stage_y) pairs seen in any
+    plane of `channels`, and {file name: path} of every matching file (the
+    first path in sorted order when a name occurs twice).
+    """
+    wanted = set(channels)
+    widths = Counter()
+    positions = set()
+    found = {}
+    for path in sorted(iter_tiff_files(str(tiff_dir), FILENAME_RE, recursive=True)):
+        name = os.path.basename(path)
+        found.setdefault(name, path)
+        m = FILENAME_RE.match(name)
+        if m["channel"] not in wanted:
+            continue
+        widths[len(m["z"])] += 1
+        positions.add((int(m["stage_x"]), int(m["stage_y"])))
+    digits = widths.most_common(1)[0][0] if widths else None
+    return digits, sorted(positions), found
+
+
+def plan_expected_files(
+    tiff_dir: str,
+    xml_meta: Dict,
+    positions: Optional[Sequence[Tuple[int, int]]] = None,
+    digits: Optional[int] = None,
+    workers: int = 16,
+    find_extra: bool = False,
+) -> FilePlan:
+    """
+    Build the expected file list from XML metadata and check it on disk.
+
+    positions:  (stage_x, stage_y) list; learned from the files present
+                (any plane of any XML channel) when None
+    digits:     zero padding of the indices; when None, probed by stat'ing
+                the first and last plane of each position (with positions
+                given), else learned from the files present
+    find_extra: also report Thorlabs-named files that are not expected
+
+    With positions given (and find_extra off) only the probed and expected
+    paths are stat'ed; the tree is listed once when positions are unknown,
+    no probed plane exists or an expected file is not in tiff_dir itself.
+    """
+    tiff_dir = Path(tiff_dir)
+    channels = file_channels(xml_meta.get("Channels") or ["ChanA"])
+    size_z = xml_meta.get("SizeZ") or 1
+    size_t = xml_meta.get("SizeT") or 1
+
+    found = None
+    if positions is not None and digits is None and not find_extra:
+        digits = _probe_digits(tiff_dir, channels, positions, size_z, size_t, workers)
+    if digits is None or positions is None or find_extra:
+        found_digits, found_positions, found = _scan_layout(tiff_dir, channels)
+        if digits is None:
+            digits = found_digits or DEFAULT_DIGITS
+        if positions is None:
+            positions = found_positions or [(1, 1)]
+
+    expected = expected_filenames(channels, positions, size_z, size_t, digits)
+    if found is None:
+        paths = [str(tiff_dir / n) for n in expected]
+        exists = stat_exists(paths, workers=workers)
+        if all(exists):
+            found = dict(zip(expected, paths))
+        else:
+            # missing here, but maybe in a subdirectory (discovery is recursive)
+            found = _scan_layout(tiff_dir, channels)[2]
+
+    plan = FilePlan(tiff_dir=tiff_dir, digits=digits, positions=list(positions), expected=expected)
+    plan.present = [found[n] for n in expected if n in found]
+    plan.missing = [n for n in expected if n not in found]
+
+    if find_extra:
+        plan.extra = sorted(set(found) - set(expected))
+
+    return plan
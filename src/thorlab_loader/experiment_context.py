@@ -0,0 +1,89 @@
+# src/thorlab_loader/experiment_context.py
+"""
+Experiment.xml parsed once per run and shared by every builder stage.
+
+experiment_context(path) returns the same ExperimentContext for the same
+file as long as its mtime and size are unchanged, so repeated lookups
+(several stages, many builders in one process) parse the XML only once.
+Derived parameters are computed on first use.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import threading
+
+from .xml_parser import ExperimentXMLParser
+
+
+class ExperimentContext:
+    """
+    Parsed Experiment.xml plus everything derived from it.
+
+    parser / tree:        the ExperimentXMLParser and its lxml tree (built on access)
+    xml_meta:             ExperimentXMLParser.extract_metadata() result
+    params:               ThorlabParamsAdapter parameters (bioio backend)
+    channel_names_index:  channel index used by the bioio metadata extractor
+    """
+
+    def __init__(self, xml_path: str):
+        self.xml_path = Path(xml_path)
+        # metadata via the streaming reader; the full tree only on demand
+        self.parser = ExperimentXMLParser(str(self.xml_path), streaming=True)
+        self._lock = threading.Lock()
+        self._xml_meta: Optional[Dict] = None
+        self._params: Optional[Dict] = None
+        self._channel_names_index = None
+
+    @property
+    def tree(self):
+        with self._lock:
+            return self.parser.load_tree()
+
+    @property
+    def xml_meta(self) -> Dict:
+        with self._lock:
+            if self._xml_meta is None:
+                self._xml_meta = self.parser.extract_metadata()
+            return self._xml_meta
+
+    @property
+    def params(self) -> Dict:
+        with self._lock:
+            if self._params is None:
+                from ylabcommon.bioio.thorlab_params_adapter import ThorlabParamsAdapter
+
+                self._params = ThorlabParamsAdapter(self.xml_path).extract()
+            return self._params
+
+    @property
+    def channel_names_index(self):
+        with self._lock:
+            if self._channel_names_index is None:
+                from ylabcommon.bioio.thorlab_bioio_stack_builder import get_channel_names_index
+
+                self._channel_names_index = get_channel_names_index(self.xml_path)
+            return self._channel_names_index
+
+    @property
+    def pixel_size(self) -> Tuple:
+        """(Z, Y, X) pixel size in µm from xml_meta (None where unknown)."""
+        meta = self.xml_meta
+        return (meta.get("PixelSizeZ"), meta.get("PixelSizeY"), meta.get("PixelSizeX"))
+
+
+@lru_cache(maxsize=32)
+def _cached_context(path: str, mtime_ns: int, size: int) -> ExperimentContext:
+    return ExperimentContext(path)
+
+
+def experiment_context(xml_path: str) -> ExperimentContext:
+    """
+    Memoized ExperimentContext keyed by resolved path, mtime and size;
+    an edited Experiment.xml is parsed again.
+    """
+    path = Path(xml_path).resolve()
+    if not path.exists():
+        raise FileNotFoundError(f"Experiment.xml missing: {xml_path}")
+    st = path.stat()
+    return _cached_context(str(path), st.st_mtime_ns, st.st_size)
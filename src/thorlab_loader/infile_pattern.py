@@ -6,9 +6,14 @@ Interprets fields:
   channel, stage_x, stage_y, z, t
 """
 
+import os
 import re
 from pathlib import Path
-from typing import Optional, Dict
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Dict
+
+import numpy as np
+import pandas as pd
 
 # Accept 'ChanA' or 'ChA' etc. Keep flexible.
 FILENAME_RE = re.compile(
@@ -20,6 +25,16 @@ FILENAME_RE = re.compile(
     r"(?:\.[^.]+)?$"                      # extension optional
 )
 
+INDEX_FIELDS = ("stage_x", "stage_y", "z", "t")
+
+TIFF_SUFFIXES = (".tif", ".tiff")
+
+# names parsed per vectorized regex pass when paths arrive as a stream
+PARSE_CHUNK = 8192
+
+# everything up to the last path separator
+_DIRNAME_RE = "^.*[" + re.escape(os.sep + (os.altsep or "")) + "]"
+
 
 def parse_filename(fname: str) -> Optional[Dict]:
     s = Path(fname).name
@@ -53,3 +68,66 @@ def parse_or_placeholder(fname: str) -> Dict:
         "t": None,
     }
 
+
+
+def iter_tiff_files(
+    directory: str,
+    pattern: "re.Pattern" = FILENAME_RE,
+    rejected: Optional[List[str]] = None,
+    recursive: bool = False,
+) -> Iterator[str]:
+    """
+    Stream paths of the TIFF files in `directory` whose name matches `pattern`
+    (searched in the name; the default is the strict Thorlabs FILENAME_RE).
+
+    Built on os.scandir: names are filtered as directory entries arrive and
+    the file type comes from the entry itself, so no stat call is made for
+    rejected names (and usually none at all). TIFF names failing the pattern
+    are appended to `rejected`. Order is directory order; with recursive=True
+    subdirectories are walked depth first (hidden ones, e.g. .thorlab, are
+    skipped).
+    """
+    pending = [directory]
+    while pending:
+        with os.scandir(pending.pop()) as it:
+            for entry in it:
+                name = entry.name
+                if not name.lower().endswith(TIFF_SUFFIXES):
+                    if recursive and not name.startswith(".") and entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    continue
+                if pattern.search(name) is None:
+                    if rejected is not None:
+                        rejected.append(entry.path)
+                    continue
+                if entry.is_file():
+                    yield entry.path
+
+
+def parse_filenames(paths: Iterable[str]) -> pd.DataFrame:
+    """
+    Vectorized parse_filename over many paths (a list or a stream, parsed
+    PARSE_CHUNK names at a time).
+
+    Returns a DataFrame with columns path, filename, channel, stage_x,
+    stage_y, z, t in input order. Index fields are int64 for matching
+    names; non-matching names have channel NaN and the index fields as
+    nullable Int64 (NA), so callers can drop them with channel.isna().
+    """
+    def parse(chunk):
+        path = pd.Series(chunk, dtype=object, name="path")
+        filename = path.str.replace(_DIRNAME_RE, "", regex=True)
+        return pd.concat([path, filename.rename("filename"), filename.str.extract(FILENAME_RE)], axis=1)
+
+    # a stream (e.g. iter_tiff_files) is parsed chunk by chunk as it arrives
+    paths = iter(paths)
+    parts = [parse(list(islice(paths, PARSE_CHUNK)))]
+    while len(parts[-1]) == PARSE_CHUNK:
+        parts.append(parse(list(islice(paths, PARSE_CHUNK))))
+    df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+    complete = bool(df["channel"].notna().all())
+    for col in INDEX_FIELDS:
+        values = pd.to_numeric(df[col])
+        df[col] = values.astype(np.int64) if complete else values.astype("Int64")
+    return df
@@ -0,0 +1,228 @@
+# src/thorlab_loader/manifest.py
+"""
+Per-group completion manifest and atomic output staging for resumable runs.
+
+Every finished group is appended as one JSON line to
+<output_dir>/.thorlab_manifest.jsonl with a fingerprint of its input files
+(path, size, mtime) and the writer options, so recording a group costs O(1)
+however many groups the run has. A rerun with resume=True skips groups whose
+latest entry still matches and whose outputs are all present.
+
+Outputs are staged in <output_dir>/.partial-<host>-<pid>-* directories;
+those left behind by a killed run on this host are removed when the manifest
+is opened. Staging directories of other hosts (an output directory shared
+over NFS) are only removed once they have been idle for a week, since their
+pid cannot be checked from here.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import socket
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".thorlab_manifest.jsonl"
+MANIFEST_VERSION = 2
+STAGING_PREFIX = ".partial-"
+# idle time after which another host's staging directory counts as abandoned
+FOREIGN_STAGING_AGE = 7 * 24 * 3600
+
+# host part of the staging names, without "-" so the name splits cleanly
+_HOST = re.sub(r"[^A-Za-z0-9.]", "_", socket.gethostname()) or "localhost"
+
+# the log is rewritten on open once superseded lines outnumber live entries
+_COMPACT_FACTOR = 2
+
+
+def input_fingerprint(paths: List[str]) -> str:
+    """
+    sha256 over (path, size, mtime_ns) of every input file, in order.
+    Only file metadata is read.
+    """
+    h = hashlib.sha256()
+    for p in paths:
+        st = os.stat(p)
+        h.update(f"{os.path.abspath(p)}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+def _atomic_write_text(path: Path, text: str):
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # exists but owned by another user
+        return True
+    return True
+
+
+def _last_modified(path: Path) -> float:
+    """Newest mtime of a directory and everything below it."""
+    newest = path.stat().st_mtime
+    for p in path.rglob("*"):
+        try:
+            newest = max(newest, p.stat().st_mtime)
+        except OSError:
+            continue
+    return newest
+
+
+def remove_stale_staging(out_dir: Path, max_age: float = FOREIGN_STAGING_AGE) -> int:
+    """
+    Remove staging directories of runs that no longer exist (killed before
+    atomic_outputs could clean up); returns how many were removed.
+
+    Directories of this host are removed when their pid is gone. Those of
+    other hosts (or with an older name) are removed only when nothing in
+    them changed for max_age seconds.
+    """
+    removed = 0
+    now = time.time()
+    for path in Path(out_dir).glob(f"{STAGING_PREFIX}*"):
+        host, pid, *_ = path.name[len(STAGING_PREFIX):].split("-") + ["", ""]
+        try:
+            if host == _HOST and pid.isdigit():
+                if int(pid) == os.getpid() or _pid_alive(int(pid)):
+                    continue
+            elif now - _last_modified(path) < max_age:
+                continue
+        except OSError:
+            # removed concurrently
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
+
+
+@contextmanager
+def atomic_outputs(out_dir: Path) -> Iterator[Path]:
+    """
+    Yield a staging directory inside out_dir. On success everything written
+    there is renamed into out_dir (same filesystem, so each rename is atomic);
+    on error the staging directory is removed and out_dir is left untouched.
+    """
+    out_dir = Path(out_dir)
+    staging = Path(tempfile.mkdtemp(prefix=f"{STAGING_PREFIX}{_HOST}-{os.getpid()}-", dir=out_dir))
+    try:
+        yield staging
+        for item in staging.iterdir():
+            target = out_dir / item.name
+            if target.is_dir() and not target.is_symlink():
+                # e.g. a stale .ome.zarr store
+                shutil.rmtree(target)
+            os.replace(item, target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+class ConversionManifest:
+    """
+    Completed groups of one output directory, keyed by output base name.
+    """
+
+    def __init__(self, out_dir: str):
+        self.out_dir = Path(out_dir)
+        self.path = self.out_dir / MANIFEST_NAME
+        self.entries: Dict[str, dict] = {}
+
+        stale = remove_stale_staging(self.out_dir)
+        if stale:
+            logger.info(f"Removed {stale} stale staging dir(s) in {self.out_dir}")
+
+        lines, clean = self._load()
+        if not clean or lines > _COMPACT_FACTOR * max(1, len(self.entries)):
+            self.save()
+
+    def _load(self):
+        """
+        Replay the log, later lines winning. Returns (lines read, clean);
+        clean is False after a torn last line (a run killed mid-append).
+        """
+        try:
+            text = self.path.read_text(encoding="utf-8")
+        except OSError:
+            return 0, True
+        if not text:
+            return 0, True
+
+        rows = text.split("\n")
+        try:
+            header = json.loads(rows[0])
+        except ValueError:
+            header = {}
+        if header.get("version") != MANIFEST_VERSION:
+            # unknown format: start over, every group is redone
+            return 0, True
+
+        lines, clean = 0, text.endswith("\n")
+        for row in rows[1:]:
+            if not row:
+                continue
+            try:
+                entry = json.loads(row)
+            except ValueError:
+                clean = False
+                continue
+            self.entries[entry.pop("key")] = entry
+            lines += 1
+        return lines, clean
+
+    def completed(self, key: str, fingerprint: str, options: dict) -> Optional[List[str]]:
+        """
+        Output paths of `key` if it was finished from the same inputs and
+        options and all its outputs still exist, else None.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry["fingerprint"] != fingerprint or entry["options"] != options:
+            return None
+        outputs = [str(self.out_dir / name) for name in entry["outputs"]]
+        if not all(Path(p).exists() for p in outputs):
+            return None
+        return outputs
+
+    def record(self, key: str, fingerprint: str, options: dict, outputs: List[str]):
+        """
+        Mark `key` as finished by appending one line to the manifest.
+        """
+        entry = {
+            "fingerprint": fingerprint,
+            "options": options,
+            "outputs": [Path(p).name for p in outputs],
+        }
+        if not self.path.exists():
+            self.save()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, **entry}, sort_keys=True) + "\n")
+        self.entries[key] = entry
+
+    def save(self):
+        """Rewrite the manifest atomically with one line per live entry."""
+        lines = [json.dumps({"version": MANIFEST_VERSION})]
+        lines += [
+            json.dumps({"key": key, **entry}, sort_keys=True)
+            for key, entry in self.entries.items()
+        ]
+        _atomic_write_text(self.path, "\n".join(lines) + "\n")
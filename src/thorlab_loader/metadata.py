@@ -1,101 +1,279 @@
 # src/thorlab_loader/metadata.py
 
-from typing import List, Dict
+from functools import cached_property
+from typing import List, Dict, Tuple
 from pathlib import Path
 import pandas as pd
 import numpy as np
 import logging
 
-from .infile_pattern import parse_or_placeholder
+from .infile_pattern import INDEX_FIELDS, parse_filenames
+
+
+FILE_INDEX_DTYPE = np.dtype(
+    [
+        ("channel", np.int16),   # code into ThorlabMetadata.channels
+        ("stage_x", np.int32),
+        ("stage_y", np.int32),
+        ("z", np.int32),
+        ("t", np.int32),
+    ]
+)
+
+GROUP_FIELDS = ("channel", "stage_x", "stage_y", "t")
+
+# one row per (channel, stage_x, stage_y, t) group
+GROUP_TABLE_DTYPE = np.dtype(
+    [
+        ("channel", np.int16),
+        ("stage_x", np.int32),
+        ("stage_y", np.int32),
+        ("t", np.int32),
+        ("start", np.int64),     # group rows are order[start:stop]
+        ("stop", np.int64),
+        ("n_z", np.int32),       # distinct z values
+    ]
+)
+
+
+class FileGroup:
+    """
+    Files of one (channel, stage_x, stage_y, t) group, sorted by z.
+
+    A view on the metadata index (row numbers only, no copy); columns are
+    returned as numpy arrays: group["path"], group["filename"], group["z"] ...
+    """
+
+    __slots__ = ("_meta", "rows")
+
+    def __init__(self, meta: "ThorlabMetadata", rows: np.ndarray):
+        self._meta = meta
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        if name == "path":
+            return self._meta.paths[self.rows]
+        if name == "filename":
+            return np.array([Path(p).name for p in self._meta.paths[self.rows]], dtype=object)
+        if name == "channel":
+            return self._meta.channels[self._meta.index["channel"][self.rows]]
+        return self._meta.index[name][self.rows]
 
 
 class ThorlabMetadata:
     """
     Container for all extracted metadata (XML + filenames).
-    Builds a DataFrame with fields:
-        filename, channel, stage_x, stage_y, z, t, path
+
+    Files are held in a compact index:
+        index:    structured array (FILE_INDEX_DTYPE) of channel code,
+                  stage_x, stage_y, z, t per file
+        channels: sorted channel names (index["channel"] are codes into it)
+        paths:    file paths, aligned with index
+    `df` builds the former DataFrame view once, on first access.
     """
 
     def __init__(self, xml_meta: Dict, file_paths: List[str]):
         self.xml_meta = xml_meta or {}
 
-        rows = []
-        for p in file_paths:
-            d = parse_or_placeholder(p)
-            d["path"] = p
-            d["filename"] = Path(p).name
-            rows.append(d)
-
-        df = pd.DataFrame(rows)
+        # one vectorized regex pass over all names
+        df = parse_filenames(file_paths)
 
         # ---------------------------------------------------------
         # SKIP BAD FILES (e.g., Stack.tif, summary files, etc.)
         # ---------------------------------------------------------
-        if "channel" in df.columns:
-            bad_rows = df[df["channel"].isna()]
-            if not bad_rows.empty:
-                skipped = bad_rows["filename"].tolist()
-                logging.getLogger(__name__).warning(
-                    f"Skipping {len(skipped)} file(s) that do not match expected pattern: {skipped}"
-                )
-                df = df.drop(index=bad_rows.index).reset_index(drop=True)
-
-        self.df = df
+        bad = df["channel"].isna()
+        if bad.any():
+            skipped = df.loc[bad, "filename"].tolist()
+            logging.getLogger(__name__).warning(
+                f"Skipping {len(skipped)} file(s) that do not match expected pattern: {skipped}"
+            )
+            df = df.loc[~bad].reset_index(drop=True)
+
+        codes, channels = pd.factorize(df["channel"], sort=True)
+        self.channels = np.asarray(channels, dtype=object)
+        self.paths = df["path"].to_numpy(dtype=object)
+
+        self.index = np.empty(len(df), dtype=FILE_INDEX_DTYPE)
+        self.index["channel"] = codes
+        # Normalize types
+        self._coerce_types(df)
+
+        self._group_bounds = None
+
+    @classmethod
+    def from_index(cls, xml_meta: Dict, paths, channels, index: np.ndarray) -> "ThorlabMetadata":
+        """
+        Build from already parsed keys (e.g. a DatasetIndex) without
+        re-parsing file names. index["channel"] are codes into `channels`;
+        unused channels are dropped and codes are renumbered in sorted order.
+        """
+        self = cls.__new__(cls)
+        self.xml_meta = xml_meta or {}
+        self.paths = np.asarray(paths, dtype=object)
 
+        self.index = np.empty(len(index), dtype=FILE_INDEX_DTYPE)
+        for col in INDEX_FIELDS:
+            self.index[col] = index[col]
 
+        used, inverse = np.unique(index["channel"], return_inverse=True)
+        names = np.asarray(channels, dtype=object)[used]
+        order = np.argsort(names)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        self.index["channel"] = rank[inverse]
+        self.channels = names[order]
 
-        # Normalize types + log anomalies
-        self._coerce_types()
+        self._group_bounds = None
+        return self
 
     # ------------------------------------------------------------------
     # TYPE VALIDATION
     # ------------------------------------------------------------------
-    def _coerce_types(self):
+    def _coerce_types(self, df: pd.DataFrame):
         """
-        Ensures z, t, stage_x, stage_y are integers where possible.
-        Warns if float-like values appear unexpectedly.
+        Stores z, t, stage_x, stage_y as int32 index fields.
+        The regex only accepts digits, so after dropping unmatched names
+        the cast is exact; it is done per column, never per element.
         """
-
-        int_fields = ["stage_x", "stage_y", "z", "t"]
-
-        for col in int_fields:
-            if col not in self.df.columns:
-                continue
-
-            # Identify floats
-            float_mask = self.df[col].apply(lambda x: isinstance(x, float))
-            if float_mask.any():
-                bad_vals = self.df.loc[float_mask, col].unique().tolist()
-                print(
-                    f"[metadata] WARNING: column '{col}' contains float values {bad_vals}. "
-                    f"Attempting to cast to integers."
-                )
-
-            # Convert to integer where possible
-            self.df[col] = pd.to_numeric(self.df[col], errors="coerce").astype("Int64")
+        for col in INDEX_FIELDS:
+            values = df[col].to_numpy(dtype=np.int64)
+            if len(values) and values.max() > np.iinfo(np.int32).max:
+                raise ValueError(f"Filename field '{col}' out of range: {values.max()}")
+            self.index[col] = values
+
+    @cached_property
+    def df(self) -> pd.DataFrame:
+        """
+        DataFrame view (filename, channel, stage_x, stage_y, z, t, path),
+        built from the index on first access and kept. Assigning meta.df
+        replaces the view only; grouping and validation use the index.
+        """
+        df = pd.DataFrame(
+            {
+                "filename": [Path(p).name for p in self.paths],
+                "channel": self.channels[self.index["channel"]],
+            }
+        )
+        for col in INDEX_FIELDS:
+            df[col] = self.index[col].astype(np.int64)
+        df["path"] = self.paths
+        return df
 
     # ------------------------------------------------------------------
     # GROUPING
     # ------------------------------------------------------------------
+    def _grouping(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (order, table): rows sorted by (channel, stage_x, stage_y, t, z) and
+        one GROUP_TABLE_DTYPE row per group. Computed once with np.lexsort
+        and key-change detection, then shared by validate_integrity and
+        groups().
+        """
+        if self._group_bounds is None:
+            idx = self.index
+            # lexsort sorts by the last key first
+            order = np.lexsort(
+                (idx["z"], idx["t"], idx["stage_y"], idx["stage_x"], idx["channel"])
+            )
+            key = idx[list(GROUP_FIELDS)][order]
+            z = idx["z"][order]
+
+            new_group = np.ones(len(order), dtype=bool)
+            new_group[1:] = key[1:] != key[:-1]
+            # z is sorted inside each group: count value changes
+            new_z = new_group.copy()
+            new_z[1:] |= z[1:] != z[:-1]
+
+            starts = np.flatnonzero(new_group)
+            table = np.empty(len(starts), dtype=GROUP_TABLE_DTYPE)
+            for field in GROUP_FIELDS:
+                table[field] = key[field][starts]
+            table["start"] = starts
+            table["stop"] = np.append(starts[1:], len(order))
+            table["n_z"] = np.add.reduceat(new_z, starts) if len(starts) else 0
+
+            self._group_bounds = (order, table)
+        return self._group_bounds
+
+    def _group_key(self, row) -> Tuple[str, int, int, int]:
+        return (
+            self.channels[row["channel"]],
+            int(row["stage_x"]),
+            int(row["stage_y"]),
+            int(row["t"]),
+        )
+
     def groups(self):
         """
-        Yield (group_key, df_group) grouped by:
+        Yield (group_key, FileGroup) for each
             (channel, stage_x, stage_y, t)
-        Groups include None/NA values (dropna=False).
-        Subgroups sorted by z ascending.
+        in sorted key order. Each FileGroup holds row numbers sorted by z.
         """
-        df = self.df.copy()
+        order, table = self._grouping()
+        for row in table:
+            yield self._group_key(row), FileGroup(self, order[row["start"]:row["stop"]])
 
-        grouped = df.groupby(
-            ["channel", "stage_x", "stage_y", "t"],
-            dropna=False
-        )
+    # ------------------------------------------------------------------
+    # HYPERSTACK LAYOUT
+    # ------------------------------------------------------------------
+    def channel_names(self) -> List[str]:
+        """Sorted channel names (hyperstack C order)."""
+        return self.channels.tolist()
 
-        for key, sub in grouped:
-            if "z" in sub.columns:
-                sub = sub.sort_values(by="z", na_position="last")
+    def positions(self) -> List[Tuple[int, int]]:
+        """Sorted (stage_x, stage_y) positions."""
+        pos = np.unique(self.index[["stage_x", "stage_y"]])
+        return [(int(x), int(y)) for x, y in pos.tolist()]
 
-            yield key, sub
+    def hyperstack(self, stage_x: int, stage_y: int) -> Tuple[Tuple[int, int, int], List[str]]:
+        """
+        File paths of one stage position in T, C, Z order (Z fastest).
+
+        Returns ((T, C, Z), paths). Raises ValueError if any (t, channel, z)
+        plane is missing or duplicated, since a hyperstack needs a full grid.
+        """
+        idx = self.index
+        rows = np.flatnonzero((idx["stage_x"] == stage_x) & (idx["stage_y"] == stage_y))
+        sub = idx[rows]
+
+        ts = np.unique(sub["t"])
+        zs = np.unique(sub["z"])
+        nt, nc, nz = len(ts), len(self.channels), len(zs)
+
+        # flat T, C, Z position of every file
+        flat = (
+            np.searchsorted(ts, sub["t"]) * nc + sub["channel"].astype(np.int64)
+        ) * nz + np.searchsorted(zs, sub["z"])
+        counts = np.bincount(flat, minlength=nt * nc * nz)
+
+        def planes(mask):
+            i = np.flatnonzero(mask)
+            t, rest = np.divmod(i, nc * nz)
+            c, z = np.divmod(rest, nz)
+            return [
+                (int(ts[a]), str(self.channels[b]), int(zs[d]))
+                for a, b, d in zip(t, c, z)
+            ]
+
+        if (counts > 1).any():
+            dup = planes(counts > 1)
+            raise ValueError(
+                f"Duplicate planes at position ({stage_x}, {stage_y}): {dup[:5]}"
+            )
+
+        if (counts == 0).any():
+            missing = planes(counts == 0)
+            raise ValueError(
+                f"Incomplete hyperstack at position ({stage_x}, {stage_y}): "
+                f"{len(missing)} missing (t, channel, z) planes, e.g. {missing[:5]}"
+            )
+
+        order = np.empty(nt * nc * nz, dtype=np.int64)
+        order[flat] = rows
+        return (nt, nc, nz), self.paths[order].tolist()
 
     # ------------------------------------------------------------------
     # INTEGRITY VALIDATION
@@ -107,6 +285,9 @@ class ThorlabMetadata:
         - SizeZ: each (channel, X, Y, T) group must contain exactly SizeZ slices
         - SizeT: global T count must match SizeT
         - Channels: parsed channels must match XML channels (best effort)
+
+        All checks are aggregates over the index (no per-group iteration);
+        the grouping computed here is reused by groups().
         """
 
         sizez = self.xml_meta.get("SizeZ")
@@ -117,16 +298,10 @@ class ThorlabMetadata:
         # VALIDATE Z-DEPTH
         # ------------------------------
         if sizez is not None:
-            bad = []
-            for key, sub in self.groups():
-                unique_z = sub["z"].dropna().unique().tolist()
-
-                if len(unique_z) == 0:
-                    # no z info – skip
-                    continue
-
-                if len(unique_z) != sizez:
-                    bad.append((key, len(unique_z)))
+            # distinct z per group, from the memoized group table
+            _, table = self._grouping()
+            wrong = table[table["n_z"] != sizez]
+            bad = [(self._group_key(row), int(row["n_z"])) for row in wrong]
 
             if bad:
                 raise ValueError(
@@ -137,7 +312,7 @@ class ThorlabMetadata:
         # VALIDATE TIME FRAMES
         # ------------------------------
         if sizet is not None:
-            tvals = self.df["t"].dropna().unique().tolist()
+            tvals = np.unique(self.index["t"]).tolist()
 
             if len(tvals) != 0 and len(tvals) != sizet:
                 raise ValueError(
@@ -149,10 +324,7 @@ class ThorlabMetadata:
         # ------------------------------
         if channels_xml:
             ch_xml_norm = [c.lower() for c in channels_xml]
-            ch_parsed_norm = [
-                str(c).lower()
-                for c in self.df["channel"].dropna().unique().tolist()
-            ]
+            ch_parsed_norm = [str(c).lower() for c in self.channels]
 
             for ch in ch_parsed_norm:
                 if not any(ch in cx or cx in ch for cx in ch_xml_norm):
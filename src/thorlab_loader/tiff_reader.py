@@ -1,31 +1,244 @@
 # src/thorlab_loader/tiff_reader.py
-from typing import List
+from typing import Iterator, List, Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import tifffile
 import numpy as np
 
+from ylabcommon.utils import log_warn
+
 
 def read_image(path: str) -> np.ndarray:
     """
     Robust read for single image file path.
-    Returns a 2D numpy array (Y, X). If image is multi-page, returns first page or raises.
+    Returns a 2D numpy array (Y, X). Only the first page is decoded; if the
+    file holds more pages they are reported and left untouched.
     """
-    arr = tifffile.imread(path)
+    with tifffile.TiffFile(path) as tif:
+        arr = _first_page(tif, path).asarray()
     if arr.ndim == 2:
         return arr
     # common case: (1, Y, X)
     if arr.ndim == 3 and arr.shape[0] == 1:
         return arr.squeeze(0)
-    # if arr is multi-page with pages -> stack? but we expect 2D images in each file
+    # single page with several samples (S, Y, X): keep the first one
     if arr.ndim == 3 and arr.shape[0] > 1:
-        # warn and return first page
+        log_warn(f"{path} has {arr.shape[0]} samples per pixel; using first sample")
         return arr[0]
     raise ValueError(f"Unsupported image dimensions: {arr.shape} for file {path}")
 
 
-def read_stack(paths: List[str]):
+def count_pages(path: str) -> int:
+    """
+    Number of pages (IFDs) in a TIFF file, read from the header chain only.
+    """
+    with tifffile.TiffFile(path) as tif:
+        return len(tif.pages)
+
+
+def check_page_counts(paths: List[str], expected: int = 1) -> List[Tuple[str, int]]:
+    """
+    Return (path, n_pages) for every file whose page count differs from
+    `expected`. Only IFDs are parsed; no pixel data is decoded.
+    """
+    bad = []
+    for p in paths:
+        n = count_pages(p)
+        if n != expected:
+            bad.append((p, n))
+    if bad:
+        log_warn(f"{len(bad)} file(s) with unexpected page count (expected {expected}): {bad[:5]}")
+    return bad
+
+
+def _first_page(tif: "tifffile.TiffFile", path: str):
+    """
+    Return the first page of an open TiffFile, warning if the file is multi-page.
+    """
+    n_pages = len(tif.pages)
+    if n_pages == 0:
+        raise ValueError(f"No image pages in file {path}")
+    if n_pages > 1:
+        log_warn(f"{path} has {n_pages} pages, expected 1; using first page only")
+    return tif.pages[0]
+
+
+def _plane_shape(shape: Tuple[int, ...], path: str) -> Tuple[int, int]:
+    """
+    Normalize a page shape to (Y, X), dropping leading length-1 axes.
+    """
+    dims = tuple(int(s) for s in shape)
+    while len(dims) > 2 and dims[0] == 1:
+        dims = dims[1:]
+    if len(dims) != 2:
+        raise ValueError(f"Unsupported image dimensions: {shape} for file {path}")
+    return dims
+
+
+def probe_image(path: str) -> Tuple[Tuple[int, int], np.dtype]:
+    """
+    Return ((Y, X), dtype) of the first page using the TIFF header only.
+    No pixel data is decoded.
+    """
+    with tifffile.TiffFile(path) as tif:
+        page = tif.pages[0]
+        return _plane_shape(page.shape, path), np.dtype(page.dtype)
+
+
+def probe_layout(path: str) -> dict:
+    """
+    Header facts of the first page: shape (Y, X), dtype, compression code,
+    first data offset, total data bytes and number of strips / tiles.
+    No pixel data is decoded.
+    """
+    with tifffile.TiffFile(path) as tif:
+        page = tif.pages[0]
+        return {
+            "shape": _plane_shape(page.shape, path),
+            "dtype": np.dtype(page.dtype),
+            "compression": int(page.compression),
+            "dataoffset": int(page.dataoffsets[0]) if page.dataoffsets else 0,
+            "databytes": int(sum(page.databytecounts)),
+            "n_strips": len(page.dataoffsets),
+        }
+
+
+def read_image_into(path: str, out: np.ndarray) -> np.ndarray:
+    """
+    Decode the first page of `path` directly into `out` (a writable (Y, X) array),
+    e.g. one Z slice of a preallocated stack. No intermediate plane is allocated.
+    """
+    with tifffile.TiffFile(path) as tif:
+        page = _first_page(tif, path)
+        shape = _plane_shape(page.shape, path)
+        if shape != out.shape or np.dtype(page.dtype) != out.dtype:
+            raise ValueError(
+                f"Plane {path} has shape {shape} / dtype {page.dtype}, "
+                f"expected {out.shape} / {out.dtype}"
+            )
+        page.asarray(out=out)
+    return out
+
+
+def memmap_image(path: str) -> Optional[np.ndarray]:
     """
-    Read list of file paths into numpy stack (Z, Y, X)
+    Zero-copy (Y, X) view of the first page as a read-only np.memmap.
+
+    Returns None when the page cannot be mapped (compressed, tiled into
+    fragments, predictor, ...); callers then fall back to decoding.
     """
-    imgs = [read_image(p) for p in paths]
-    return np.stack(imgs, axis=0)
+    with tifffile.TiffFile(path) as tif:
+        page = _first_page(tif, path)
+        if not page.is_memmappable:
+            return None
+        shape = _plane_shape(page.shape, path)
+        dtype = np.dtype(page.dtype).newbyteorder(tif.byteorder)
+        offset = page.dataoffsets[0]
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+
+
+def read_planes(paths: List[str], memmap: bool = True) -> List[np.ndarray]:
+    """
+    Return one (Y, X) array per file without building a stack.
+
+    With memmap=True uncompressed contiguous files are returned as np.memmap
+    views (no decoding, no copy); other files are decoded.
+    """
+    return [_read_plane(p, memmap) for p in paths]
+
+
+def iter_planes(paths: List[str], workers: int = 1, memmap: bool = False) -> Iterator[np.ndarray]:
+    """
+    Yield one (Y, X) plane per file, in order, for streaming writers.
+
+    With workers > 1 up to `workers` files are read ahead on a thread pool,
+    so at most workers + 1 planes are alive at any time.
+    """
+    if workers <= 1:
+        for p in paths:
+            yield _read_plane(p, memmap)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as exe:
+        pending = deque()
+        for p in paths:
+            pending.append(exe.submit(_read_plane, p, memmap))
+            if len(pending) > workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _fill_plane(path: str, out: np.ndarray, memmap: bool) -> np.ndarray:
+    if memmap:
+        view = memmap_image(path)
+        if view is not None:
+            if view.shape != out.shape:
+                raise ValueError(
+                    f"Plane {path} has shape {view.shape}, expected {out.shape}"
+                )
+            out[...] = view
+            return out
+    return read_image_into(path, out)
+
+
+def read_stack(paths: List[str], workers: int = 1, memmap: bool = False) -> np.ndarray:
+    """
+    Read list of file paths into numpy stack (Z, Y, X).
+
+    Shape and dtype are probed from the first file's header, the output is
+    allocated once and every file is decoded straight into its Z slice, so
+    peak memory is one stack (plus the decoder's working buffers).
+
+    With workers > 1 the files are decoded by a bounded thread pool; each
+    worker writes into its own slice, so Z order follows `paths`.
+
+    With memmap=True uncompressed contiguous files are copied from a
+    memory-mapped view instead of going through the decoder; compressed or
+    fragmented files are decoded as usual.
+    """
+    if not paths:
+        raise ValueError("No TIFF files provided for stacking.")
+
+    (ny, nx), dtype = probe_image(paths[0])
+    stack = np.empty((len(paths), ny, nx), dtype=dtype)
+
+    if workers <= 1 or len(paths) == 1:
+        for i, p in enumerate(paths):
+            _fill_plane(p, stack[i], memmap)
+        return stack
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths))) as exe:
+        # consume the results so the first decoding error is raised here
+        for _ in exe.map(lambda i: _fill_plane(paths[i], stack[i], memmap), range(len(paths))):
+            pass
+
+    return stack
+
+
+def _read_plane(path: str, memmap: bool) -> np.ndarray:
+    view = memmap_image(path) if memmap else None
+    return view if view is not None else read_image(path)
+
+
+def lazy_stack(paths: List[str], memmap: bool = False):
+    """
+    Lazy (Z, Y, X) dask array with one delayed chunk per source file.
+
+    Only the first file's header is read up front; planes are decoded when
+    the chunks are computed, so consumers can stream through the stack.
+    """
+    import dask
+    import dask.array as da
+
+    if not paths:
+        raise ValueError("No TIFF files provided for stacking.")
+
+    (ny, nx), dtype = probe_image(paths[0])
+    load = dask.delayed(_read_plane, pure=True)
 
+    planes = [
+        da.from_delayed(load(p, memmap), shape=(ny, nx), dtype=dtype)
+        for p in paths
+    ]
+    return da.stack(planes, axis=0)
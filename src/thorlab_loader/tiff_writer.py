@@ -1,37 +1,642 @@
 # src/thorlab_loader/tiff_writer.py
 import tifffile
+import tempfile
+import threading
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import numpy as np
 #from .utils import ensure_parent, log_info
 from ylabcommon.utils import find_tiff_files, log_info, log_warn
 
-def save_ome_tiff(stack_z_y_x: np.ndarray, out_path: str, axes: str = "TCZYX"):
+
+def ensure_parent(out_path: str):
+    """
+    Create the parent directory of out_path if needed.
+    """
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+
+
+# ----------------------------
+# Compression options
+# ----------------------------
+
+# TIFF codecs accepted by the writers; lzw takes no level
+COMPRESSIONS = ("zlib", "zstd", "lzw")
+
+
+def compression_kwargs(
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    predictor: bool = False,
+    maxworkers: Optional[int] = None,
+) -> Dict:
+    """
+    Translate writer options into tifffile.imwrite keyword arguments.
+
+    compression: None / "none", "zlib", "zstd" or "lzw"
+    predictor:   horizontal differencing (helps smooth 16-bit images)
+    maxworkers:  threads tifffile uses to encode strips in parallel
+    """
+    if compression is None or str(compression).lower() == "none":
+        return {}
+
+    name = str(compression).lower()
+    if name not in COMPRESSIONS:
+        raise ValueError(
+            f"Unsupported TIFF compression '{compression}'. "
+            f"Choose one of {COMPRESSIONS} (LZ4 has no TIFF codec)."
+        )
+
+    kwargs = {"compression": name}
+    if compression_level is not None and name != "lzw":
+        kwargs["compressionargs"] = {"level": int(compression_level)}
+    if predictor:
+        kwargs["predictor"] = True
+    if maxworkers:
+        kwargs["maxworkers"] = int(maxworkers)
+    return kwargs
+
+
+# ----------------------------
+# BigTIFF selection
+# ----------------------------
+
+# Classic TIFF uses 32-bit offsets; keep 32 MB headroom for IFDs and OME-XML
+BIGTIFF_THRESHOLD = 2**32 - 2**25
+
+# Worst-case size of encoded data relative to raw (incompressible input)
+_WORST_CASE_EXPANSION = {"zlib": 1.01, "zstd": 1.01, "lzw": 1.5}
+
+# Per-page IFD, tag and strip/tile table overhead (generous)
+_PAGE_OVERHEAD = 4096
+
+
+def projected_tiff_bytes(
+    shape: Tuple[int, ...],
+    dtype,
+    compression: Optional[str] = None,
+    pyramid_levels: int = 0,
+) -> int:
+    """
+    Upper bound of the file size for an image of `shape` / `dtype`.
+
+    With compression the encoded size is unknown before writing, so the
+    bound uses the codec's worst-case expansion of the raw data.
+    Pyramid levels add 1/4 of the previous level each.
+    """
+    shape = tuple(int(s) for s in shape)
+    raw = int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+    raw *= sum(0.25 ** k for k in range(pyramid_levels + 1))
+
+    if compression is not None and str(compression).lower() != "none":
+        raw *= _WORST_CASE_EXPANSION.get(str(compression).lower(), 1.5)
+
+    n_pages = int(np.prod(shape[:-2], dtype=np.int64)) if len(shape) > 2 else 1
+    n_pages *= pyramid_levels + 1
+    return int(raw) + n_pages * _PAGE_OVERHEAD
+
+
+def needs_bigtiff(
+    shape: Tuple[int, ...],
+    dtype,
+    compression: Optional[str] = None,
+    pyramid_levels: int = 0,
+) -> bool:
+    """
+    True if the projected output may not fit in a classic (32-bit) TIFF.
+    Deciding up front avoids failing halfway and rewriting as BigTIFF.
+    """
+    return projected_tiff_bytes(shape, dtype, compression, pyramid_levels) > BIGTIFF_THRESHOLD
+
+
+def save_ome_tiff(
+    stack_z_y_x: np.ndarray,
+    out_path: str,
+    axes: str = "TCZYX",
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    predictor: bool = False,
+    maxworkers: Optional[int] = None,
+):
     """
     stack_z_y_x: (Z, Y, X) -> will be saved as (T=1,C=1,Z,Y,X) with axes 'TCZYX'
+    compression options: see compression_kwargs()
     """
     ensure_parent(out_path)
     arr = stack_z_y_x[np.newaxis, np.newaxis, :, :, :]  # (1,1,Z,Y,X)
     # tifffile will build minimal OME-XML if ome=True
-    tifffile.imwrite(str(out_path), arr, ome=True, metadata={"axes": "TCZYX"})
+    tifffile.imwrite(
+        str(out_path),
+        arr,
+        bigtiff=needs_bigtiff(arr.shape, arr.dtype, compression),
+        ome=True,
+        metadata={"axes": "TCZYX"},
+        **compression_kwargs(compression, compression_level, predictor, maxworkers),
+    )
     log_info(f"[OK] Saved OME-TIFF → {out_path}")
     return out_path
 
 
-def save_plain_tiff(stack_z_y_x: np.ndarray, out_path: str):
+def save_plain_tiff(
+    stack_z_y_x: np.ndarray,
+    out_path: str,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    predictor: bool = False,
+    maxworkers: Optional[int] = None,
+):
     """
     Save plain multi-page TIFF where each page is a Z slice.
     """
     ensure_parent(out_path)
-    tifffile.imwrite(str(out_path), stack_z_y_x, photometric="minisblack")
+    tifffile.imwrite(
+        str(out_path),
+        stack_z_y_x,
+        bigtiff=needs_bigtiff(stack_z_y_x.shape, stack_z_y_x.dtype, compression),
+        photometric="minisblack",
+        **compression_kwargs(compression, compression_level, predictor, maxworkers),
+    )
     log_info(f"[OK] Saved plain TIFF → {out_path}")
     return out_path
-    
 
 
+# ----------------------------
+# Plane-streaming writers
+# ----------------------------
 
+def _tczyx_shape(shape: Tuple[int, ...]) -> Tuple[int, int, int, int, int]:
+    """
+    (Z, Y, X) -> (1, 1, Z, Y, X); a 5D (T, C, Z, Y, X) shape is kept as is.
+    """
+    shape = tuple(int(s) for s in shape)
+    if len(shape) == 3:
+        return (1, 1) + shape
+    if len(shape) == 5:
+        return shape
+    raise ValueError(f"Expected (Z, Y, X) or (T, C, Z, Y, X) shape, got {shape}")
+
+
+def save_ome_tiff_stream(
+    planes: Iterable[np.ndarray],
+    out_path: str,
+    shape: Tuple[int, ...],
+    dtype,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    predictor: bool = False,
+    maxworkers: Optional[int] = None,
+    channel_names: Optional[List[str]] = None,
+    pixel_size=None,
+):
+    """
+    Write an OME-TIFF page by page from an iterator of (Y, X) planes.
+
+    shape: (Z, Y, X), saved as (T=1, C=1, Z, Y, X), or a full (T, C, Z, Y, X)
+           shape; planes must come in that C-order (Z fastest).
+    Only the plane currently being written is held in memory.
+    """
+    ensure_parent(out_path)
+    shape = _tczyx_shape(shape)
+    tifffile.imwrite(
+        str(out_path),
+        data=iter(planes),
+        shape=shape,
+        dtype=np.dtype(dtype),
+        bigtiff=needs_bigtiff(shape, dtype, compression),
+        ome=True,
+        metadata=_ome_metadata(channel_names=channel_names, pixel_size=pixel_size),
+        **compression_kwargs(compression, compression_level, predictor, maxworkers),
+    )
+    log_info(f"[OK] Saved OME-TIFF (streamed) → {out_path}")
+    return out_path
+
+
+def save_ome_tiff_series(
+    series: List[Tuple[str, Tuple[int, ...], Iterable[np.ndarray]]],
+    out_path: str,
+    dtype,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    predictor: bool = False,
+    maxworkers: Optional[int] = None,
+    channel_names: Optional[List[str]] = None,
+    pixel_size=None,
+):
+    """
+    Write several TCZYX images (e.g. stage positions) as OME series of one file.
+
+    series: list of (name, (T, C, Z, Y, X) shape, plane iterator); each
+            iterator is consumed in turn, so one plane is in memory at a time.
+    """
+    ensure_parent(out_path)
+    shapes = [_tczyx_shape(shape) for _, shape, _ in series]
+    total = sum(projected_tiff_bytes(shape, dtype, compression) for shape in shapes)
+    options = compression_kwargs(compression, compression_level, predictor, maxworkers)
+
+    with tifffile.TiffWriter(str(out_path), bigtiff=total > BIGTIFF_THRESHOLD, ome=True) as tif:
+        for (name, _, planes), shape in zip(series, shapes):
+            tif.write(
+                data=iter(planes),
+                shape=shape,
+                dtype=np.dtype(dtype),
+                photometric="minisblack",
+                metadata=_ome_metadata(name, channel_names, pixel_size),
+                **options,
+            )
+    log_info(f"[OK] Saved OME-TIFF with {len(series)} series → {out_path}")
+    return out_path
+
+
+def save_plain_tiff_stream(
+    planes: Iterable[np.ndarray],
+    out_path: str,
+    shape: Tuple[int, int, int],
+    dtype,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    predictor: bool = False,
+    maxworkers: Optional[int] = None,
+):
+    """
+    Plain multi-page TIFF (one page per Z slice) written from an iterator of planes.
+    """
+    ensure_parent(out_path)
+    tifffile.imwrite(
+        str(out_path),
+        data=iter(planes),
+        shape=tuple(int(s) for s in shape),
+        dtype=np.dtype(dtype),
+        bigtiff=needs_bigtiff(shape, dtype, compression),
+        photometric="minisblack",
+        **compression_kwargs(compression, compression_level, predictor, maxworkers),
+    )
+    log_info(f"[OK] Saved plain TIFF (streamed) → {out_path}")
+    return out_path
+
+
+# ----------------------------
+# Tiled multi-resolution (pyramid) writer
+# ----------------------------
+
+def downsample2x(plane: np.ndarray) -> np.ndarray:
+    """
+    Vectorized 2x2 block mean of a (Y, X) plane; an odd last row/column is dropped.
+    """
+    ny, nx = (plane.shape[0] // 2) * 2, (plane.shape[1] // 2) * 2
+    blocks = plane[:ny, :nx].reshape(ny // 2, 2, nx // 2, 2)
+    acc = np.float32 if plane.dtype.itemsize <= 2 else np.float64
+    mean = blocks.mean(axis=(1, 3), dtype=acc)
+    if np.issubdtype(plane.dtype, np.integer):
+        mean = np.rint(mean)
+    return mean.astype(plane.dtype, copy=False)
+
+
+def pyramid_level_count(shape_yx: Tuple[int, int], tile: Tuple[int, int] = (256, 256)) -> int:
+    """
+    Number of 2x reduced levels until the image fits in a single tile.
+    """
+    ny, nx = shape_yx
+    levels = 0
+    while ny > tile[0] or nx > tile[1]:
+        ny, nx = ny // 2, nx // 2
+        levels += 1
+    return levels
+
+
+def iter_yx_planes(arr) -> Iterator[np.ndarray]:
+    """
+    Yield the (Y, X) planes of a numpy / dask / xarray array in C order.
+    Lazy arrays are computed one plane at a time.
+    """
+    for idx in np.ndindex(*arr.shape[:-2]):
+        yield np.asarray(arr[idx])
+
+
+def _iter_tiles(planes: Iterable[np.ndarray], tile: Tuple[int, int]) -> Iterator[np.ndarray]:
+    """
+    Split each (Y, X) plane into row-major tiles; tifffile pads the edge tiles.
+    """
+    th, tw = tile
+    for plane in planes:
+        for y in range(0, plane.shape[0], th):
+            for x in range(0, plane.shape[1], tw):
+                yield plane[y:y + th, x:x + tw]
+
+
+def _pixel_size_metadata(pixel_size) -> Dict:
+    """
+    OME physical sizes from a (Z, Y, X) tuple in micrometers.
+    """
+    if not pixel_size:
+        return {}
+    meta = {}
+    for axis, value in zip("ZYX", pixel_size):
+        if value:
+            meta[f"PhysicalSize{axis}"] = float(value)
+            meta[f"PhysicalSize{axis}Unit"] = "µm"
+    return meta
+
+
+def _ome_metadata(name: Optional[str] = None, channel_names=None, pixel_size=None) -> Dict:
+    """
+    tifffile OME metadata for a TCZYX image.
+    """
+    meta = {"axes": "TCZYX", **_pixel_size_metadata(pixel_size)}
+    if name:
+        meta["Name"] = name
+    if channel_names:
+        meta["Channel"] = {"Name": list(channel_names)}
+    return meta
+
+
+def save_ome_tiff_pyramid(
+    planes: Iterable[np.ndarray],
+    out_path: str,
+    shape: Tuple[int, ...],
+    dtype,
+    levels: Optional[int] = None,
+    tile: Tuple[int, int] = (256, 256),
+    pixel_size=None,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    predictor: bool = False,
+    maxworkers: Optional[int] = None,
+):
+    """
+    Tiled OME-TIFF with 2x block-mean pyramid levels stored as SubIFDs.
+
+    planes: iterator of (Y, X) planes in TCZYX order, e.g. iter_yx_planes(stack)
+    shape:  (Z, Y, X) or (T, C, Z, Y, X)
+    levels: number of reduced levels (default: until one tile covers the image)
+
+    Reduced planes are computed while the full-resolution pages are written
+    (single pass over the input) and spooled to a temporary memory-mapped
+    file, so memory stays at about one plane; the levels are then appended
+    as SubIFDs of the full-resolution pages.
+    """
+    ensure_parent(out_path)
+    shape5 = _tczyx_shape(shape)
+    dtype = np.dtype(dtype)
+    n_planes = int(np.prod(shape5[:3]))
+    if levels is None:
+        levels = pyramid_level_count(shape5[-2:], tile)
+
+    level_shapes = []
+    ny, nx = shape5[-2:]
+    for _ in range(levels):
+        ny, nx = ny // 2, nx // 2
+        level_shapes.append((ny, nx))
+
+    options = dict(
+        tile=tile,
+        photometric="minisblack",
+        **compression_kwargs(compression, compression_level, predictor, maxworkers),
+    )
+    metadata = _ome_metadata(pixel_size=pixel_size)
+
+    with tempfile.TemporaryDirectory(dir=Path(out_path).parent) as spool_dir:
+        spools = [
+            np.lib.format.open_memmap(
+                Path(spool_dir) / f"level{k + 1}.npy",
+                mode="w+",
+                dtype=dtype,
+                shape=(n_planes,) + yx,
+            )
+            for k, yx in enumerate(level_shapes)
+        ]
+
+        def full_resolution():
+            for i, plane in enumerate(planes):
+                # reduce before yielding: the writer stops pulling after the last tile
+                reduced = plane
+                for spool in spools:
+                    reduced = downsample2x(reduced)
+                    spool[i] = reduced
+                yield plane
+
+        bigtiff = needs_bigtiff(shape5, dtype, compression, pyramid_levels=levels)
+        with tifffile.TiffWriter(str(out_path), bigtiff=bigtiff, ome=True) as tif:
+            tif.write(
+                data=_iter_tiles(full_resolution(), tile),
+                shape=shape5,
+                dtype=dtype,
+                subifds=levels,
+                metadata=metadata,
+                **options,
+            )
+            for spool, yx in zip(spools, level_shapes):
+                tif.write(
+                    data=_iter_tiles(spool, tile),
+                    shape=shape5[:3] + yx,
+                    dtype=dtype,
+                    subfiletype=1,
+                    metadata=None,
+                    **options,
+                )
+        del spools
+
+    log_info(f"[OK] Saved pyramid OME-TIFF ({levels} levels) → {out_path}")
+    return out_path
+
+
+# ----------------------------
+# Write-once dual output (OME-TIFF + plain TIFF)
+# ----------------------------
+
+_DONE = object()
+
+
+def _ordered_map(func: Callable, items: Iterable, workers: int) -> Iterator:
+    """
+    Map func over items on a thread pool, yielding results in input order
+    with at most `workers` items in flight.
+    """
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as exe:
+        pending = deque()
+        for item in items:
+            pending.append(exe.submit(func, item))
+            if len(pending) > workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _broadcast(items: Iterable, consumers: List[Callable[[Iterator], None]], maxsize: int = 4):
+    """
+    Feed every item to each consumer, each consumer running on its own thread
+    behind a bounded queue; re-raises the first consumer error.
+    """
+    queues = [queue.Queue(maxsize=maxsize) for _ in consumers]
+    errors = []
+
+    def run(consumer, q):
+        done = False
+
+        def drain():
+            nonlocal done
+            while True:
+                item = q.get()
+                if item is _DONE:
+                    done = True
+                    return
+                yield item
+
+        try:
+            consumer(drain())
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            # keep the producer from blocking on a consumer that stopped early
+            while not done:
+                done = q.get() is _DONE
+
+    threads = [
+        threading.Thread(target=run, args=(c, q), daemon=True)
+        for c, q in zip(consumers, queues)
+    ]
+    for t in threads:
+        t.start()
+    try:
+        for item in items:
+            if errors:
+                break
+            for q in queues:
+                q.put(item)
+    finally:
+        for q in queues:
+            q.put(_DONE)
+        for t in threads:
+            t.join()
+    if errors:
+        raise errors[0]
+
+
+def _predictor_tag(dtype, predictor: bool) -> int:
+    """
+    TIFF Predictor tag for dtype: 2 (horizontal differencing) for integers,
+    3 (floating point) for floats, 1 (none) otherwise or when disabled.
+    """
+    kind = np.dtype(dtype).kind
+    if not predictor:
+        return 1
+    if kind in "iu":
+        return 2
+    if kind == "f":
+        return 3
+    return 1
+
+
+def _strip_encoder(
+    compression: str,
+    compression_level: Optional[int],
+    predictor: int,
+    rowsperstrip: int,
+    dtype: np.dtype,
+) -> Callable[[np.ndarray], List[bytes]]:
+    """
+    Return a function encoding one (Y, X) plane into TIFF strips, applying the
+    predictor (a _predictor_tag value) itself; tifffile writes pre-encoded
+    strips as is, so planes are first converted to `dtype` (native order).
+    """
+    import imagecodecs
+
+    name = compression_kwargs(compression)["compression"]
+    level = {} if compression_level is None or name == "lzw" else {"level": int(compression_level)}
+    codec = {
+        "zlib": imagecodecs.zlib_encode,
+        "zstd": imagecodecs.zstd_encode,
+        "lzw": imagecodecs.lzw_encode,
+    }[name]
+
+    def encode(plane: np.ndarray) -> List[bytes]:
+        data = np.ascontiguousarray(plane, dtype=dtype)
+        # both predictors work row by row, so the plane is encoded at once
+        if predictor == 2:
+            data = imagecodecs.delta_encode(data, axis=-1)
+        elif predictor == 3:
+            data = imagecodecs.floatpred_encode(data, axis=-1)
+        return [
+            codec(np.ascontiguousarray(data[y:y + rowsperstrip]), **level)
+            for y in range(0, data.shape[0], rowsperstrip)
+        ]
+
+    return encode
+
+
+def save_dual_tiff(
+    planes: Iterable[np.ndarray],
+    ome_path: str,
+    raw_path: str,
+    shape: Tuple[int, int, int],
+    dtype,
+    compression: Optional[str] = None,
+    compression_level: Optional[int] = None,
+    predictor: bool = False,
+    maxworkers: Optional[int] = None,
+):
+    """
+    Write the OME-TIFF and the plain TIFF of a (Z, Y, X) stack in one pass.
+
+    Each plane is read once and handed to two writer threads. With
+    compression every strip is encoded once (on `maxworkers` threads) and
+    the same encoded bytes go into both files, so the plain TIFF costs only
+    its file I/O.
+    """
+    ensure_parent(ome_path)
+    ensure_parent(raw_path)
+    shape = tuple(int(s) for s in shape)
+    # files are written in native byte order; big-endian sources (e.g.
+    # memmapped planes) are swapped plane by plane
+    dtype = np.dtype(dtype).newbyteorder("=")
+    nz, ny, nx = shape
 
+    # ~1 MB strips
+    rowsperstrip = max(1, min(ny, 2**20 // max(1, nx * dtype.itemsize)))
+    tags = dict(photometric="minisblack", rowsperstrip=rowsperstrip)
 
+    if compression_kwargs(compression):
+        predictor = _predictor_tag(dtype, predictor)
+        encode = _strip_encoder(compression, compression_level, predictor, rowsperstrip, dtype)
+        items = (
+            strip
+            for strips in _ordered_map(encode, planes, int(maxworkers or 1))
+            for strip in strips
+        )
+        tags.update(compression=compression_kwargs(compression)["compression"], predictor=predictor)
+    else:
+        items = (np.ascontiguousarray(p, dtype=dtype) for p in planes)
 
+    def write_ome(data):
+        tifffile.imwrite(
+            str(ome_path),
+            data=data,
+            shape=_tczyx_shape(shape),
+            dtype=dtype,
+            bigtiff=needs_bigtiff(shape, dtype, compression),
+            ome=True,
+            metadata={"axes": "TCZYX"},
+            **tags,
+        )
 
-#print(f"     Shape={arr5.shape}, axes=TCZYX")
+    def write_raw(data):
+        tifffile.imwrite(
+            str(raw_path),
+            data=data,
+            shape=shape,
+            dtype=dtype,
+            bigtiff=needs_bigtiff(shape, dtype, compression),
+            **tags,
+        )
 
+    _broadcast(items, [write_ome, write_raw])
+    log_info(f"[OK] Saved OME-TIFF → {ome_path}")
+    log_info(f"[OK] Saved plain TIFF → {raw_path}")
+    return ome_path, raw_path
@@ -5,17 +5,42 @@ from lxml import etree
 from typing import Dict
 
 
+# elements read once (first occurrence); Wavelength entries are collected
+SINGLE_TAGS = ("LSM", "ZStage", "Timelapse", "Magnification")
+
+
 class ExperimentXMLParser:
+    """
+    Experiment.xml metadata reader.
+
+    streaming=False parses the whole tree (available as .tree / .root).
+    streaming=True reads the file with lxml iterparse, looks only at the
+    needed elements, frees them as it goes and stops once LSM, ZStage,
+    Timelapse, Magnification and the Wavelengths block have been seen; the
+    tree is then built only if load_tree() is called. Both modes return the
+    same metadata dict (channels are taken from the first Wavelengths block
+    in streaming mode).
+    """
 
-    def __init__(self, xml_path: str):
+    def __init__(self, xml_path: str, streaming: bool = False):
 
         self.xml_path = Path(xml_path)
+        self.streaming = streaming
 
         if not self.xml_path.exists():
             raise FileNotFoundError(f"Experiment.xml missing: {xml_path}")
 
-        self.tree = etree.parse(str(self.xml_path))
-        self.root = self.tree.getroot()
+        self.tree = None
+        self.root = None
+        if not streaming:
+            self.load_tree()
+
+    def load_tree(self):
+        """Full lxml tree (parsed on first call in streaming mode)."""
+        if self.tree is None:
+            self.tree = etree.parse(str(self.xml_path))
+            self.root = self.tree.getroot()
+        return self.tree
 
     def extract_metadata(self) -> Dict:
 
@@ -34,69 +59,95 @@ class ExperimentXMLParser:
             "DwellTime": None,
         }
 
-        # -------------------------
-        # LSM block (main imaging parameters)
-        # -------------------------
-
-        lsm = self.root.find(".//LSM")
-
-        if lsm is not None:
-
-            meta["SizeX"] = self._safe_int(lsm.get("pixelX"))
-            meta["SizeY"] = self._safe_int(lsm.get("pixelY"))
-
-            meta["PixelSizeX"] = self._safe_float(lsm.get("pixelWidthUM"))
-            meta["PixelSizeY"] = self._safe_float(lsm.get("pixelHeightUM"))
-
-            meta["FrameRate"] = self._safe_float(lsm.get("frameRate"))
-            meta["DwellTime"] = self._safe_float(lsm.get("dwellTime"))
+        if self.streaming and self.root is None:
+            self._extract_streaming(meta)
+            return meta
 
-        # -------------------------
-        # Z Stage
-        # -------------------------
+        for tag in SINGLE_TAGS:
+            el = self.root.find(f".//{tag}")
+            if el is not None:
+                self._readers[tag](self, meta, el)
 
-        zstage = self.root.find(".//ZStage")
-
-        if zstage is not None:
-
-            meta["SizeZ"] = self._safe_int(zstage.get("steps"))
-
-            step = self._safe_float(zstage.get("stepSizeUM"))
-            if step is not None:
-                meta["PixelSizeZ"] = abs(step)
-
-        # -------------------------
-        # Timelapse
-        # -------------------------
+        for w in self.root.findall(".//Wavelength"):
+            self._read_wavelength(meta, w)
 
-        tl = self.root.find(".//Timelapse")
+        return meta
 
-        if tl is not None:
+    def _extract_streaming(self, meta: Dict):
+        """
+        Single forward pass over the needed elements only.
+        """
+        pending = set(SINGLE_TAGS)
+        channels_done = False
+
+        context = etree.iterparse(
+            str(self.xml_path),
+            events=("end",),
+            tag=SINGLE_TAGS + ("Wavelength", "Wavelengths"),
+        )
+        for _, el in context:
+            tag = el.tag
+            if tag == "Wavelength":
+                if not channels_done:
+                    self._read_wavelength(meta, el)
+            elif tag == "Wavelengths":
+                channels_done = True
+            elif tag in pending:
+                self._readers[tag](self, meta, el)
+                pending.discard(tag)
+
+            # free this element and the already handled siblings before it
+            el.clear()
+            parent = el.getparent()
+            if parent is not None:
+                while el.getprevious() is not None:
+                    del parent[0]
+
+            if channels_done and not pending:
+                break
+        del context
+
+    # -------------------------
+    # Element readers (shared by both modes)
+    # -------------------------
+
+    def _read_lsm(self, meta: Dict, lsm):
+        # LSM block (main imaging parameters)
+        meta["SizeX"] = self._safe_int(lsm.get("pixelX"))
+        meta["SizeY"] = self._safe_int(lsm.get("pixelY"))
 
-            meta["SizeT"] = self._safe_int(tl.get("timepoints"))
-            meta["TimeIntervalSec"] = self._safe_float(tl.get("intervalSec"))
+        meta["PixelSizeX"] = self._safe_float(lsm.get("pixelWidthUM"))
+        meta["PixelSizeY"] = self._safe_float(lsm.get("pixelHeightUM"))
 
-        # -------------------------
-        # Channels
-        # -------------------------
+        meta["FrameRate"] = self._safe_float(lsm.get("frameRate"))
+        meta["DwellTime"] = self._safe_float(lsm.get("dwellTime"))
 
-        for w in self.root.findall(".//Wavelength"):
+    def _read_zstage(self, meta: Dict, zstage):
+        meta["SizeZ"] = self._safe_int(zstage.get("steps"))
 
-            name = w.get("name")
+        step = self._safe_float(zstage.get("stepSizeUM"))
+        if step is not None:
+            meta["PixelSizeZ"] = abs(step)
 
-            if name:
-                meta["Channels"].append(name)
+    def _read_timelapse(self, meta: Dict, tl):
+        meta["SizeT"] = self._safe_int(tl.get("timepoints"))
+        meta["TimeIntervalSec"] = self._safe_float(tl.get("intervalSec"))
 
-        # -------------------------
-        # Objective
-        # -------------------------
+    def _read_wavelength(self, meta: Dict, w):
+        name = w.get("name")
 
-        mag = self.root.find(".//Magnification")
+        if name:
+            meta["Channels"].append(name)
 
-        if mag is not None:
-            meta["Objective"] = mag.get("name")
+    def _read_magnification(self, meta: Dict, mag):
+        meta["Objective"] = mag.get("name")
 
-        return meta
+    _readers = {
+        "LSM": _read_lsm,
+        "ZStage": _read_zstage,
+        "Timelapse": _read_timelapse,
+        "Magnification": _read_magnification,
+    }
 
     def _safe_int(self, value):
         try:
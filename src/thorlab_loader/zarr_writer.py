@@ -0,0 +1,196 @@
+# src/thorlab_loader/zarr_writer.py
+"""
+Chunked OME-Zarr (NGFF 0.5 / Zarr v3) writer.
+
+Needs the optional 'zarr' extra:  pip install "thorlab_loader[zarr]"
+"""
+
+from pathlib import Path
+from typing import Optional, Tuple
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import shutil
+import numpy as np
+from ylabcommon.utils import log_info
+
+# Blosc codecs usable for Zarr chunks
+ZARR_COMPRESSIONS = ("zstd", "lz4", "zlib")
+
+AXES = (
+    {"name": "t", "type": "time", "unit": "second"},
+    {"name": "c", "type": "channel"},
+    {"name": "z", "type": "space", "unit": "micrometer"},
+    {"name": "y", "type": "space", "unit": "micrometer"},
+    {"name": "x", "type": "space", "unit": "micrometer"},
+)
+
+
+def _import_zarr():
+    try:
+        import zarr
+    except ImportError as e:
+        raise ImportError(
+            "OME-Zarr output requires the optional 'zarr' extra: "
+            'pip install "thorlab_loader[zarr]"'
+        ) from e
+    return zarr
+
+
+def _as_tczyx(data):
+    """
+    View a (Z, Y, X) or (T, C, Z, Y, X) numpy / dask / xarray array as 5D.
+    """
+    if hasattr(data, "dims") and hasattr(data, "coords"):
+        # xarray.DataArray -> underlying numpy / dask array
+        data = data.data
+    if data.ndim == 3:
+        return data[np.newaxis, np.newaxis]
+    if data.ndim == 5:
+        return data
+    raise ValueError(f"Expected (Z, Y, X) or (T, C, Z, Y, X) data, got shape {data.shape}")
+
+
+def _ceil_to(value: int, step: int) -> int:
+    return -(-value // step) * step
+
+
+def default_chunks(shape: Tuple[int, ...], chunk_yx: int = 512) -> Tuple[int, ...]:
+    """
+    One Z plane per chunk, split in (chunk_yx, chunk_yx) tiles.
+    """
+    t, c, z, y, x = shape
+    return (1, 1, 1, min(y, chunk_yx), min(x, chunk_yx))
+
+
+def default_shards(shape: Tuple[int, ...], chunks: Tuple[int, ...], planes_per_shard: int = 16):
+    """
+    Shards holding `planes_per_shard` full planes, so a Z stack of N planes
+    is stored in ceil(N / planes_per_shard) files per (T, C).
+    """
+    t, c, z, y, x = shape
+    return (
+        1,
+        1,
+        min(z, planes_per_shard) * chunks[2],
+        _ceil_to(y, chunks[3]),
+        _ceil_to(x, chunks[4]),
+    )
+
+
+def save_ome_zarr(
+    data,
+    out_path: str,
+    pixel_size=None,
+    time_interval: Optional[float] = None,
+    chunks: Optional[Tuple[int, ...]] = None,
+    shards: Optional[Tuple[int, ...]] = "auto",
+    compression: Optional[str] = "zstd",
+    compression_level: Optional[int] = 5,
+    workers: int = 4,
+):
+    """
+    Write a (Z, Y, X) or (T, C, Z, Y, X) array as an OME-Zarr image.
+
+    data:       numpy, dask or xarray array; lazy arrays are read block by block
+    pixel_size: (Z, Y, X) in µm for the NGFF scale transform
+    chunks:     5D chunk shape (default: one Z plane, 512x512 tiles)
+    shards:     5D shard shape, "auto" (16 planes per shard) or None to
+                store every chunk as its own object
+    workers:    threads writing shards (or chunks) concurrently
+
+    Work is split along Z in shard-sized blocks (or chunk-sized blocks when
+    sharding is off), so no two threads write the same storage object and
+    at most `workers` blocks are held in memory at a time.
+    """
+    zarr = _import_zarr()
+    from zarr.codecs import BloscCodec
+
+    arr5 = _as_tczyx(data)
+    shape = tuple(int(s) for s in arr5.shape)
+    dtype = np.dtype(arr5.dtype)
+
+    chunks = tuple(chunks) if chunks else default_chunks(shape)
+    if shards == "auto":
+        shards = default_shards(shape, chunks)
+
+    compressors = None
+    if compression and str(compression).lower() != "none":
+        cname = str(compression).lower()
+        if cname not in ZARR_COMPRESSIONS:
+            raise ValueError(
+                f"Unsupported Zarr compression '{compression}'. "
+                f"Choose one of {ZARR_COMPRESSIONS}."
+            )
+        compressors = BloscCodec(
+            cname=cname,
+            clevel=5 if compression_level is None else int(compression_level),
+            shuffle="bitshuffle" if dtype.itemsize > 1 else "shuffle",
+            typesize=dtype.itemsize,
+        )
+
+    out_path = Path(out_path)
+    if out_path.exists():
+        shutil.rmtree(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    root = zarr.open_group(str(out_path), mode="w", zarr_format=3)
+    image = root.create_array(
+        "0",
+        shape=shape,
+        chunks=chunks,
+        shards=shards,
+        dtype=dtype,
+        compressors=compressors,
+        fill_value=0,
+        dimension_names=[a["name"] for a in AXES],
+    )
+
+    dz, dy, dx = (tuple(pixel_size) if pixel_size else (None, None, None))
+    scale = [
+        float(time_interval or 1.0),
+        1.0,
+        float(dz or 1.0),
+        float(dy or 1.0),
+        float(dx or 1.0),
+    ]
+    root.attrs["ome"] = {
+        "version": "0.5",
+        "multiscales": [
+            {
+                "name": out_path.name.split(".")[0],
+                "axes": list(AXES),
+                "datasets": [
+                    {
+                        "path": "0",
+                        "coordinateTransformations": [{"type": "scale", "scale": scale}],
+                    }
+                ],
+            }
+        ],
+    }
+
+    # Z blocks aligned to the storage object each thread owns
+    z_step = (shards or chunks)[2]
+    blocks = [
+        (t, c, z0, min(z0 + z_step, shape[2]))
+        for t in range(shape[0])
+        for c in range(shape[1])
+        for z0 in range(0, shape[2], z_step)
+    ]
+
+    def write_block(block):
+        t, c, z0, z1 = block
+        image[t, c, z0:z1] = np.asarray(arr5[t, c, z0:z1])
+
+    workers = max(1, int(workers))
+    with ThreadPoolExecutor(max_workers=workers) as exe:
+        pending = deque()
+        for block in blocks:
+            pending.append(exe.submit(write_block, block))
+            if len(pending) >= workers:
+                pending.popleft().result()
+        while pending:
+            pending.popleft().result()
+
+    log_info(f"[OK] Saved OME-Zarr → {out_path}")
+    return str(out_path)
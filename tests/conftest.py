@@ -45,6 +45,7 @@ def pytest_configure(config):
         "integration_bioio: full BioIO integration test",
         "slow: heavy dataset or stress test",
         "regression: scientific reproducibility tests",
+        "timing: wall-clock comparisons (deselect on loaded machines with -m 'not timing')",
     ]
 
     for m in markers:
@@ -75,6 +76,7 @@ def fake_dataset(tmp_path):
     # Fake TIFFs (names must pass initial filters)
     for i in range(3):
         (ds / f"ChanA_{i:03d}.tif").write_bytes(b"FAKE_TIFF")
+    (ds / "ChanA_001_001_001_001.tif").write_bytes(b"FAKE_TIFF")
 
     # Minimal XML
     (ds / "Experiment.xml").write_text("<Experiment></Experiment>")
@@ -0,0 +1,103 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import tifffile
+
+from thorlab_loader.backends.bioio_thorlab_builder import ThorlabBioioBuilder
+from thorlab_loader.expected_files import expected_filenames
+
+
+def _dataset(tmp_path, size_z=3):
+    src = tmp_path / "tiffs"
+    src.mkdir()
+    plane = np.zeros((16, 32), dtype=np.uint16)
+    paths = []
+    for name in expected_filenames(["ChanA"], [(1, 1)], size_z, 1):
+        tifffile.imwrite(src / name, plane)
+        paths.append(src / name)
+    return src, paths
+
+
+def _no_stacking(*args, **kwargs):
+    pytest.fail("pixel data was stacked")
+
+
+class _Report:
+    """ReportBuilder stand-in writing one JSON file next to the output."""
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    def write(self, out_dir, output_filename):
+        (Path(out_dir) / f"{Path(output_filename).name}.report.json").write_text("{}")
+
+
+@pytest.mark.unit
+def test_cache_hit_restores_cold_build_outputs(tmp_path, monkeypatch):
+    report_builder = pytest.importorskip("ylabcommon.utils.report_builder")
+    monkeypatch.setattr(report_builder, "ReportBuilder", _Report)
+    src, paths = _dataset(tmp_path)
+    stack = np.arange(3 * 16 * 32, dtype=np.uint16).reshape(1, 1, 3, 16, 32)
+    image_meta = SimpleNamespace(pixel_size=None, dim_order="TCZYX")
+
+    def build(out_dir, stacking):
+        builder = ThorlabBioioBuilder(
+            src, None, out_dir, pyramid=True, validate_metadata=True, cache_dir=tmp_path / "cache"
+        )
+        monkeypatch.setattr(builder, "_discover", lambda: (paths, None))
+        monkeypatch.setattr(builder, "_discover_and_stack", stacking)
+        monkeypatch.setattr(builder, "_load_with_bioio", lambda data, ctx=None: (data, image_meta, "ChanA"))
+        monkeypatch.setattr(builder, "_validate_thorlab_stack", lambda *a: {"status": "VALIDATED"})
+        builder.build()
+        return {p.name: p.read_bytes() for p in Path(out_dir).iterdir() if p.is_file()}
+
+    cold = build(tmp_path / "cold", lambda ctx=None, tiff_files=None: (stack, paths))
+    warm = build(tmp_path / "warm", _no_stacking)
+
+    assert any(name.endswith(".report.json") for name in cold)
+    assert any(name.endswith(".ome.tif") for name in cold)
+    assert warm == cold
+
+
+@pytest.mark.unit
+def test_build_rejects_size_z_mismatch_before_stacking(tmp_path, monkeypatch):
+    src, paths = _dataset(tmp_path, size_z=3)
+    builder = ThorlabBioioBuilder(src, None, tmp_path / "out")
+    xml_meta = {"SizeX": 32, "SizeY": 16, "SizeZ": 4, "SizeT": 1, "Channels": ["ChanA"]}
+    monkeypatch.setattr(builder, "_discover", lambda: (paths, None))
+    monkeypatch.setattr(
+        ThorlabBioioBuilder, "context", property(lambda self: SimpleNamespace(xml_meta=xml_meta, pixel_size=None))
+    )
+    monkeypatch.setattr(builder, "_discover_and_stack", _no_stacking)
+    monkeypatch.setattr(builder, "_load_with_bioio", _no_stacking)
+
+    with pytest.raises(ValueError, match="SizeZ"):
+        builder.build()
+
+    # fail_fast=False (--no_validate) only reports and goes on to stacking
+    builder.fail_fast = False
+    def stacking(*args):
+        raise RuntimeError("stacking reached")
+
+    monkeypatch.setattr(builder, "_discover_and_stack", stacking)
+    with pytest.raises(RuntimeError, match="stacking reached"):
+        builder.build()
+
+
+@pytest.mark.unit
+def test_dry_run_reads_no_pixels(tmp_path, monkeypatch, capsys):
+    src, paths = _dataset(tmp_path)
+    builder = ThorlabBioioBuilder(src, None, tmp_path / "out", dry_run=True)
+    monkeypatch.setattr(builder, "_discover", lambda: (paths, None))
+    monkeypatch.setattr(builder, "_discover_and_stack", _no_stacking)
+    monkeypatch.setattr(builder, "_load_with_bioio", _no_stacking)
+    monkeypatch.setattr(tifffile.TiffPage, "asarray", _no_stacking)
+
+    builder.build()
+
+    out = capsys.readouterr().out
+    assert "(1, 1, 3, 16, 32) (TCZYX)" in out
+    assert "Dry run completed successfully." in out
+    assert not any((tmp_path / "out").iterdir())
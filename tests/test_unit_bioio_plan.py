@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+import tifffile
+
+from thorlab_loader.backends.bioio_plan import (
+    NOMINAL_COMPRESSION_RATIO,
+    estimate_output_bytes,
+    plan_stack,
+)
+from thorlab_loader.backends.bioio_validation import ValidationConfig, rejected_checks
+from thorlab_loader.expected_files import expected_filenames
+from thorlab_loader.metadata import ThorlabMetadata
+
+
+def _write_planes(tmp_path, names, compression=None):
+    plane = np.tile(np.arange(32, dtype=np.uint16), (16, 1))
+    for n in names:
+        tifffile.imwrite(tmp_path / n, plane, compression=compression)
+    return [str(tmp_path / n) for n in names]
+
+
+@pytest.mark.unit
+def test_plan_shape_and_sizes_from_headers(tmp_path, monkeypatch):
+    xml_meta = {"SizeX": 32, "SizeY": 16, "SizeZ": 3, "SizeT": 2, "Channels": ["ChanA", "ChanB"]}
+    paths = _write_planes(tmp_path, expected_filenames(["ChanA", "ChanB"], [(1, 1)], 3, 2), "zlib")
+
+    # no pixel data may be decoded while planning
+    monkeypatch.setattr(tifffile.TiffPage, "asarray", lambda *a, **k: pytest.fail("pixels read"))
+
+    plan = plan_stack(ThorlabMetadata(xml_meta, paths), xml_meta, output_path=tmp_path / "out.ome.tif")
+
+    assert plan.shape == (2, 2, 3, 16, 32)
+    assert plan.dtype == np.uint16
+    assert plan.uncompressed_bytes == 2 * 2 * 3 * 16 * 32 * 2
+    assert plan.estimate_source == "source bytecounts"
+    assert 0 < plan.estimated_bytes < plan.uncompressed_bytes
+    assert plan.validation["status"] == "VALIDATED"
+
+
+@pytest.mark.unit
+def test_plan_flags_xml_mismatch(tmp_path):
+    xml_meta = {"SizeX": 32, "SizeY": 16, "SizeZ": 4, "SizeT": 1, "Channels": ["ChanA"]}
+    paths = _write_planes(tmp_path, expected_filenames(["ChanA"], [(1, 1)], 3, 1))
+
+    plan = plan_stack(ThorlabMetadata(xml_meta, paths), xml_meta, compression="none")
+
+    assert plan.estimated_bytes == plan.uncompressed_bytes
+    assert plan.validation["status"] == "NOT VALIDATED"
+    failed = [c["name"] for c in plan.validation["checks"] if not c["ok"]]
+    assert failed == ["SizeZ"]
+
+
+@pytest.mark.unit
+def test_validation_config_controls_rejection(tmp_path):
+    xml_meta = {"SizeX": 32, "SizeY": 16, "SizeZ": 3, "SizeT": 1, "Channels": ["ChanA", "ChanB"]}
+    paths = _write_planes(tmp_path, expected_filenames(["ChanA"], [(1, 1)], 3, 1))
+    meta = ThorlabMetadata(xml_meta, paths)
+
+    strict = plan_stack(meta, xml_meta)
+    assert [c["name"] for c in rejected_checks(strict.validation)] == ["Channels"]
+
+    lenient = plan_stack(meta, xml_meta, config=ValidationConfig(strict_channels=False))
+    assert lenient.validation["status"] == "NOT VALIDATED"
+    assert rejected_checks(lenient.validation) == []
+
+
+@pytest.mark.unit
+def test_swapped_xy_allowed_by_config(tmp_path):
+    xml_meta = {"SizeX": 16, "SizeY": 32, "SizeZ": 3, "SizeT": 1, "Channels": ["ChanA"]}
+    paths = _write_planes(tmp_path, expected_filenames(["ChanA"], [(1, 1)], 3, 1))
+    meta = ThorlabMetadata(xml_meta, paths)
+
+    assert plan_stack(meta, xml_meta).validation["status"] == "VALIDATED"
+
+    fixed = plan_stack(meta, xml_meta, config=ValidationConfig(allow_axis_permutation=False))
+    assert [c["name"] for c in rejected_checks(fixed.validation)] == ["SizeX", "SizeY"]
+
+
+@pytest.mark.unit
+def test_estimate_scales_source_ratio_to_target_codec():
+    layouts = [{"shape": (16, 32), "dtype": np.dtype(np.uint16), "compression": 5, "databytes": 512}]
+
+    same, how = estimate_output_bytes(layouts, 1024, "lzw")
+    assert (same, how) == (512, "source bytecounts")
+
+    other, how = estimate_output_bytes(layouts, 1024, "zstd")
+    expected = 512 * NOMINAL_COMPRESSION_RATIO["zstd"] / NOMINAL_COMPRESSION_RATIO["lzw"]
+    assert other == int(expected)
+    assert "lzw → zstd" in how
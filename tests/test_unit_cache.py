@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from thorlab_loader.cache import ConversionCache
+from thorlab_loader.manifest import input_fingerprint
+
+
+def _output(tmp_path, name, size):
+    p = tmp_path / name
+    p.write_bytes(b"x" * size)
+    return str(p)
+
+
+@pytest.mark.unit
+def test_cache_key_covers_inputs_xml_and_options(tmp_path):
+    src = _output(tmp_path, "ChanA_001_001_001_001.tif", 8)
+    xml = tmp_path / "Experiment.xml"
+    xml.write_text("<ThorImageExperiment/>")
+    cache = ConversionCache(tmp_path / "cache")
+    fp = input_fingerprint([src])
+
+    key = cache.key(fp, str(xml), {"compression": "zlib"})
+
+    assert cache.key(fp, str(xml), {"compression": "zlib"}) == key
+    assert cache.key(fp, str(xml), {"compression": None}) != key
+    xml.write_text("<ThorImageExperiment version='2'/>")
+    assert cache.key(fp, str(xml), {"compression": "zlib"}) != key
+
+
+@pytest.mark.unit
+def test_cache_hit_is_a_private_copy_by_default(tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    out = _output(tmp_path, "a.ome.tif", 16)
+    cache.store("k" * 64, [out])
+
+    (tmp_path / "other").mkdir()
+    hit = cache.fetch("k" * 64, tmp_path / "other")
+
+    assert not os.path.samefile(hit[0], out)
+    # editing the output in place leaves the cache entry intact
+    with open(hit[0], "r+b") as f:
+        f.write(b"\xff")
+    (tmp_path / "third").mkdir()
+    again = cache.fetch("k" * 64, tmp_path / "third")
+    with open(again[0], "rb") as f:
+        assert f.read(1) == b"x"
+
+
+@pytest.mark.unit
+def test_cache_hit_is_hardlinked_on_request(tmp_path):
+    cache = ConversionCache(tmp_path / "cache", hardlink=True)
+    out = _output(tmp_path, "a.ome.tif", 16)
+
+    assert cache.fetch("k" * 64, tmp_path / "other") is None
+    cache.store("k" * 64, [out])
+
+    (tmp_path / "other").mkdir()
+    hit = cache.fetch("k" * 64, tmp_path / "other")
+
+    assert hit == [str(tmp_path / "other" / "a.ome.tif")]
+    assert os.path.samefile(hit[0], out)
+
+
+@pytest.mark.unit
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ConversionCache(tmp_path / "cache", max_bytes=25)
+    (tmp_path / "o").mkdir()
+    for i, key in enumerate(("a" * 64, "b" * 64)):
+        cache.store(key, [_output(tmp_path, f"{i}.tif", 10)])
+        os.utime(cache._entry_dir(key) / "entry.json", (i, i))
+
+    cache.fetch("a" * 64, tmp_path / "o")  # a is now the most recent
+    cache.store("c" * 64, [_output(tmp_path, "2.tif", 10)])
+
+    kept = {path.name for _, _, path in cache.entries()}
+    assert kept == {"a" * 64, "c" * 64}
+
+
+@pytest.mark.unit
+def test_store_under_cap_reads_no_entries(tmp_path, monkeypatch):
+    cache = ConversionCache(tmp_path / "cache", max_bytes=1000)
+    cache.store("a" * 64, [_output(tmp_path, "0.tif", 10)])
+    monkeypatch.setattr(ConversionCache, "entries", lambda self: pytest.fail("entries walked"))
+
+    for i, key in enumerate(("b" * 64, "c" * 64), start=1):
+        cache.store(key, [_output(tmp_path, f"{i}.tif", 10)])
+
+    assert cache.total_bytes() == 30
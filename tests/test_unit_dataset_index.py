@@ -0,0 +1,83 @@
+import os
+
+import numpy as np
+import pytest
+import tifffile
+
+import thorlab_loader.dataset_index as dataset_index
+from thorlab_loader.dataset_index import DatasetIndex
+
+
+def _write_dataset(tmp_path, nz=3):
+    for z in range(1, nz + 1):
+        for ch in ("ChanA", "ChanB"):
+            tifffile.imwrite(
+                tmp_path / f"{ch}_001_001_{z:03d}_001.tif",
+                np.full((8, 6), z, dtype=np.uint16),
+            )
+    tifffile.imwrite(tmp_path / "Stack.tif", np.zeros((2, 2), dtype=np.uint8))
+
+
+@pytest.mark.unit
+def test_index_holds_keys_and_headers(tmp_path):
+    _write_dataset(tmp_path)
+
+    idx = DatasetIndex(tmp_path).refresh()
+
+    assert len(idx.names) == 7
+    assert [os.path.basename(p) for p in idx.paths()][:2] == [
+        "ChanA_001_001_001_001.tif",
+        "ChanA_001_001_002_001.tif",
+    ]
+    assert idx.header(idx.paths()[0]) == ((8, 6), np.dtype(np.uint16))
+
+    meta = idx.metadata({"SizeZ": 3})
+    meta.validate_integrity()
+    assert meta.channel_names() == ["ChanA", "ChanB"]
+
+
+@pytest.mark.unit
+def test_refresh_only_probes_changed_files(tmp_path, monkeypatch):
+    _write_dataset(tmp_path)
+    DatasetIndex(tmp_path).refresh()
+
+    probed = []
+    probe = dataset_index.probe_layout
+    monkeypatch.setattr(dataset_index, "probe_layout", lambda p: probed.append(p) or probe(p))
+
+    DatasetIndex(tmp_path).refresh()
+    assert probed == []
+
+    changed = tmp_path / "ChanB_001_001_002_001.tif"
+    tifffile.imwrite(changed, np.zeros((4, 4), dtype=np.uint8))
+    st = os.stat(changed)
+    os.utime(changed, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    tifffile.imwrite(tmp_path / "ChanA_001_001_004_001.tif", np.zeros((8, 6), dtype=np.uint16))
+
+    idx = DatasetIndex(tmp_path).refresh()
+
+    assert sorted(os.path.basename(p) for p in probed) == [
+        "ChanA_001_001_004_001.tif",
+        "ChanB_001_001_002_001.tif",
+    ]
+    assert idx.header(str(changed)) == ((4, 4), np.dtype(np.uint8))
+
+
+@pytest.mark.unit
+def test_index_walks_subdirectories(tmp_path):
+    _write_dataset(tmp_path, nz=2)
+    sub = tmp_path / "part2"
+    sub.mkdir()
+    tifffile.imwrite(sub / "ChanA_001_001_003_001.tif", np.zeros((8, 6), dtype=np.uint16))
+
+    idx = DatasetIndex(tmp_path).refresh()
+    assert str(sub / "ChanA_001_001_003_001.tif") in idx.paths()
+    assert idx.header(str(sub / "ChanA_001_001_003_001.tif")) == ((8, 6), np.dtype(np.uint16))
+
+    # a file added to the subdirectory only changes that directory's mtime
+    tifffile.imwrite(sub / "ChanB_001_001_003_001.tif", np.zeros((8, 6), dtype=np.uint16))
+    st = os.stat(sub)
+    os.utime(sub, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    idx = DatasetIndex(tmp_path).refresh()
+    assert str(sub / "ChanB_001_001_003_001.tif") in idx.paths()
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+from thorlab_loader.expected_files import (
+    expected_filenames,
+    file_channels,
+    plan_expected_files,
+)
+
+
+def _touch(tmp_path, names):
+    for n in names:
+        (tmp_path / n).write_bytes(b"")
+
+
+@pytest.mark.unit
+def test_expected_filenames_layout():
+    names = expected_filenames(["ChanA"], [(1, 2)], size_z=2, size_t=2, digits=4)
+
+    assert names == [
+        "ChanA_0001_0002_0001_0001.tif",
+        "ChanA_0001_0002_0002_0001.tif",
+        "ChanA_0001_0002_0001_0002.tif",
+        "ChanA_0001_0002_0002_0002.tif",
+    ]
+    assert file_channels(["ChanA", "GFP"]) == ["ChanA", "ChanB"]
+
+
+@pytest.mark.unit
+def test_plan_reports_missing_and_extra(tmp_path):
+    xml_meta = {"Channels": ["ChanA", "ChanB"], "SizeZ": 3, "SizeT": 2}
+    names = expected_filenames(["ChanA", "ChanB"], [(1, 1), (2, 1)], 3, 2)
+    _touch(tmp_path, names[1:] + ["ChanA_001_001_004_001.tif", "Stack.tif"])
+
+    plan = plan_expected_files(tmp_path, xml_meta, workers=4, find_extra=True)
+
+    assert plan.digits == 3
+    assert plan.positions == [(1, 1), (2, 1)]
+    assert len(plan.expected) == 24
+    assert plan.missing == [names[0]]
+    assert plan.extra == ["ChanA_001_001_004_001.tif"]
+    assert len(plan.present) == 23 and not plan.complete
+
+
+@pytest.mark.unit
+def test_layout_learned_without_first_plane(tmp_path):
+    xml_meta = {"Channels": ["ChanA"], "SizeZ": 2, "SizeT": 2}
+    names = expected_filenames(["ChanA"], [(1, 1), (2, 1)], 2, 2, digits=4)
+    _touch(tmp_path, names[1:])
+
+    plan = plan_expected_files(tmp_path, xml_meta)
+
+    assert plan.digits == 4
+    assert plan.positions == [(1, 1), (2, 1)]
+    assert plan.missing == [names[0]]
+
+
+@pytest.mark.unit
+def test_irregular_position_grid(tmp_path):
+    xml_meta = {"Channels": ["ChanA"], "SizeZ": 1, "SizeT": 1}
+    _touch(tmp_path, expected_filenames(["ChanA"], [(2, 3), (5, 1)], 1, 1))
+
+    plan = plan_expected_files(tmp_path, xml_meta)
+
+    assert plan.positions == [(2, 3), (5, 1)]
+    assert plan.complete
+
+
+@pytest.mark.unit
+def test_given_layout_only_stats_expected_paths(tmp_path, monkeypatch):
+    xml_meta = {"Channels": ["ChanA"], "SizeZ": 2, "SizeT": 1}
+    _touch(tmp_path, expected_filenames(["ChanA"], [(1, 1)], 2, 1))
+    monkeypatch.setattr(os, "scandir", lambda *a: pytest.fail("directory listed"))
+
+    plan = plan_expected_files(tmp_path, xml_meta, positions=[(1, 1)], digits=3)
+
+    assert plan.complete and len(plan.present) == 2
+
+
+@pytest.mark.unit
+def test_digits_probed_by_stat_when_positions_given(tmp_path, monkeypatch):
+    xml_meta = {"Channels": ["ChanA"], "SizeZ": 3, "SizeT": 2}
+    names = expected_filenames(["ChanA"], [(1, 1), (2, 1)], 3, 2, digits=4)
+    _touch(tmp_path, names)
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda *a: pytest.fail("directory listed"))
+
+    plan = plan_expected_files(tmp_path, xml_meta, positions=[(1, 1), (2, 1)])
+
+    assert plan.digits == 4 and plan.complete
+
+    # a gap is confirmed by one listing; the padding still comes from the probe
+    os.unlink(tmp_path / names[0])
+    monkeypatch.setattr(os, "scandir", scandir)
+
+    plan = plan_expected_files(tmp_path, xml_meta, positions=[(1, 1), (2, 1)])
+
+    assert plan.digits == 4
+    assert plan.missing == [names[0]]
+
+
+@pytest.mark.unit
+def test_planes_found_in_subdirectories(tmp_path):
+    xml_meta = {"Channels": ["ChanA"], "SizeZ": 2, "SizeT": 1}
+    names = expected_filenames(["ChanA"], [(1, 1)], 2, 1)
+    (tmp_path / "part2").mkdir()
+    _touch(tmp_path, names[:1])
+    _touch(tmp_path / "part2", names[1:])
+
+    for positions in (None, [(1, 1)]):
+        plan = plan_expected_files(tmp_path, xml_meta, positions=positions)
+
+        assert plan.complete
+        assert plan.present == [str(tmp_path / names[0]), str(tmp_path / "part2" / names[1])]
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+import thorlab_loader.experiment_context as ec
+from thorlab_loader.experiment_context import experiment_context
+
+XML = """<ThorImageExperiment>
+<LSM pixelX="24" pixelY="32" pixelWidthUM="0.5" pixelHeightUM="0.5"/>
+<ZStage steps="{steps}" stepSizeUM="-1.5"/>
+<Wavelengths><Wavelength name="ChanA"/></Wavelengths>
+</ThorImageExperiment>"""
+
+
+@pytest.mark.unit
+def test_context_parsed_once_until_xml_changes(tmp_path, monkeypatch):
+    xml = tmp_path / "Experiment.xml"
+    xml.write_text(XML.format(steps=4))
+
+    parsed = []
+    parser = ec.ExperimentXMLParser
+    monkeypatch.setattr(ec, "ExperimentXMLParser", lambda p, **kw: parsed.append(p) or parser(p, **kw))
+
+    ctx = experiment_context(xml)
+    assert experiment_context(str(xml)) is ctx
+    assert ctx.xml_meta is ctx.xml_meta
+    assert ctx.xml_meta["SizeZ"] == 4
+    assert ctx.pixel_size == (1.5, 0.5, 0.5)
+    assert len(parsed) == 1
+
+    xml.write_text(XML.format(steps=10))
+    st = os.stat(xml)
+    os.utime(xml, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    assert experiment_context(xml).xml_meta["SizeZ"] == 10
+    assert len(parsed) == 2
@@ -0,0 +1,118 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+import tifffile
+
+REPO = Path(__file__).resolve().parents[1]
+
+# modules the entry points must not load before real work starts
+HEAVY = ("pandas", "tifffile", "ylabcommon", "bioio", "xarray", "dask", "zarr")
+
+# a --dry_run plan reads names and headers (pandas, tifffile, ylabcommon
+# naming helpers) but must not load the BioIO / pixel stack
+DRY_RUN_HEAVY = ("bioio", "xarray", "dask", "zarr")
+
+# Timings are compared with a reference import measured in the same run
+# rather than absolute budgets, so a loaded machine slows both sides.
+HELP_SCRIPTS = ["run_process_experiment.py", "run_bioio_process_experiment.py"]
+
+
+def _run(code: str, heavy=HEAVY):
+    out = subprocess.run(
+        [sys.executable, "-c", _measure(code, heavy)],
+        capture_output=True, text=True, timeout=120, cwd=REPO,
+    )
+    assert out.returncode == 0, out.stderr
+    elapsed, loaded = out.stdout.strip().splitlines()[-1].split("|")
+    return float(elapsed), [m for m in loaded.split(",") if m]
+
+
+def _measure(body: str, heavy) -> str:
+    return (
+        "import sys, time\n"
+        "t0 = time.perf_counter()\n"
+        f"{body}\n"
+        "dt = time.perf_counter() - t0\n"
+        f"heavy = [m for m in {tuple(heavy)!r} if m in sys.modules]\n"
+        "print(f'{dt}|' + ','.join(heavy))\n"
+    )
+
+
+def _cli(script: str, *args: str) -> str:
+    return (
+        "import runpy, io, contextlib\n"
+        f"sys.argv = [{script!r}, *{list(args)!r}]\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    try:\n"
+        f"        runpy.run_path({script!r}, run_name='__main__')\n"
+        "    except SystemExit as e:\n"
+        "        assert not e.code, e.code"
+    )
+
+
+def _baseline(modules: str) -> float:
+    """Best of three cold imports of `modules` in a fresh interpreter."""
+    return min(_run(f"import {modules}", heavy=())[0] for _ in range(3))
+
+
+@pytest.fixture
+def tiny_dataset(tmp_path):
+    src = tmp_path / "tiffs"
+    src.mkdir()
+    for z in range(1, 3):
+        tifffile.imwrite(src / f"ChanA_001_001_{z:03d}_001.tif", np.zeros((8, 8), np.uint16))
+    return src
+
+
+def _dry_run_args(tiny_dataset):
+    out = tiny_dataset.parent / "out"
+    return ("--tiff-dir", str(tiny_dataset), "--output-dir", str(out),
+            "--base_path", "tiny", "--dry_run")
+
+
+@pytest.mark.unit
+def test_import_thorlab_loader_is_lazy():
+    _, loaded = _run("import thorlab_loader")
+
+    assert loaded == []
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("script", HELP_SCRIPTS)
+def test_cli_help_starts_without_pipeline_imports(script):
+    _, loaded = _run(_cli(script, "--help"))
+
+    assert loaded == []
+
+
+@pytest.mark.unit
+def test_bioio_dry_run_skips_pixel_stack(tiny_dataset):
+    pytest.importorskip("ylabcommon.io.outfile_name")
+
+    _, loaded = _run(_cli("run_bioio_process_experiment.py", *_dry_run_args(tiny_dataset)),
+                     heavy=DRY_RUN_HEAVY)
+
+    assert loaded == []
+
+
+@pytest.mark.timing
+def test_import_and_help_cost_less_than_numpy():
+    reference = _baseline("numpy")
+
+    assert _run("import thorlab_loader")[0] < reference
+    for script in HELP_SCRIPTS:
+        assert _run(_cli(script, "--help"))[0] < 2 * reference
+
+
+@pytest.mark.timing
+def test_dry_run_costs_about_its_imports(tiny_dataset):
+    pytest.importorskip("ylabcommon.io.outfile_name")
+    reference = _baseline("pandas, tifffile")
+
+    elapsed, _ = _run(_cli("run_bioio_process_experiment.py", *_dry_run_args(tiny_dataset)),
+                      heavy=DRY_RUN_HEAVY)
+
+    assert elapsed < 3 * reference
@@ -0,0 +1,110 @@
+import os
+import time
+
+import pytest
+
+from thorlab_loader.manifest import (
+    ConversionManifest,
+    atomic_outputs,
+    input_fingerprint,
+)
+
+
+def _inputs(tmp_path, n=3):
+    paths = []
+    for i in range(n):
+        p = tmp_path / f"ChanA_001_001_{i + 1:03d}_001.tif"
+        p.write_bytes(b"x" * (i + 1))
+        paths.append(str(p))
+    return paths
+
+
+@pytest.mark.unit
+def test_fingerprint_changes_with_size_or_mtime(tmp_path):
+    paths = _inputs(tmp_path)
+    fp = input_fingerprint(paths)
+
+    assert input_fingerprint(paths) == fp
+
+    st = os.stat(paths[1])
+    os.utime(paths[1], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert input_fingerprint(paths) != fp
+
+
+@pytest.mark.unit
+def test_manifest_round_trip_and_stale_entries(tmp_path):
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    paths = _inputs(tmp_path)
+    fp = input_fingerprint(paths)
+    opts = {"compression": "zlib"}
+    (out_dir / "a.ome.tif").write_bytes(b"done")
+
+    ConversionManifest(out_dir).record("a", fp, opts, [str(out_dir / "a.ome.tif")])
+
+    manifest = ConversionManifest(out_dir)
+    assert manifest.completed("a", fp, opts) == [str(out_dir / "a.ome.tif")]
+    assert manifest.completed("a", fp, {"compression": None}) is None
+    assert manifest.completed("a", "other", opts) is None
+    assert manifest.completed("b", fp, opts) is None
+
+    (out_dir / "a.ome.tif").unlink()
+    assert manifest.completed("a", fp, opts) is None
+
+
+@pytest.mark.unit
+def test_atomic_outputs_discard_on_error(tmp_path):
+    with atomic_outputs(tmp_path) as staging:
+        (staging / "ok.tif").write_bytes(b"1")
+
+    with pytest.raises(RuntimeError):
+        with atomic_outputs(tmp_path) as staging:
+            (staging / "broken.tif").write_bytes(b"half")
+            raise RuntimeError("crash")
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["ok.tif"]
+
+
+@pytest.mark.unit
+def test_manifest_appends_and_survives_torn_line(tmp_path):
+    manifest = ConversionManifest(tmp_path)
+    for i in range(3):
+        manifest.record(f"g{i}", "fp", {}, [])
+    manifest.record("g0", "fp2", {}, [])
+
+    lines = (tmp_path / ".thorlab_manifest.jsonl").read_text().splitlines()
+    assert len(lines) == 5  # header + one line per record
+
+    with open(tmp_path / ".thorlab_manifest.jsonl", "a") as f:
+        f.write('{"key": "g9", "fing')  # killed mid-append
+
+    reopened = ConversionManifest(tmp_path)
+    assert sorted(reopened.entries) == ["g0", "g1", "g2"]
+    assert reopened.entries["g0"]["fingerprint"] == "fp2"
+    reopened.record("g3", "fp", {}, [])
+    assert sorted(ConversionManifest(tmp_path).entries) == ["g0", "g1", "g2", "g3"]
+
+
+@pytest.mark.unit
+def test_manifest_removes_stale_staging(tmp_path, monkeypatch):
+    import thorlab_loader.manifest as manifest_module
+
+    host = manifest_module._HOST
+    dead = tmp_path / f".partial-{host}-999999-abc"
+    live = tmp_path / f".partial-{host}-{os.getpid()}-def"
+    # other nodes sharing the output dir: only removed once idle for long
+    foreign, idle = tmp_path / ".partial-node2-1-ghi", tmp_path / ".partial-node2-2-jkl"
+    legacy = tmp_path / ".partial-xyz"
+    for d in (dead, live, foreign, idle, legacy):
+        d.mkdir()
+        (d / "half.tif").write_bytes(b"x")
+    old = time.time() - manifest_module.FOREIGN_STAGING_AGE - 60
+    for d in (idle, legacy):
+        os.utime(d / "half.tif", (old, old))
+        os.utime(d, (old, old))
+    monkeypatch.setattr(manifest_module, "_pid_alive", lambda pid: False)
+
+    ConversionManifest(tmp_path)
+
+    assert not dead.exists() and not idle.exists() and not legacy.exists()
+    assert live.exists() and foreign.exists()
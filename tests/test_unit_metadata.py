@@ -0,0 +1,144 @@
+import re
+
+import pytest
+
+from thorlab_loader.infile_pattern import iter_tiff_files
+from thorlab_loader.metadata import ThorlabMetadata
+
+
+def _names(channels=("ChanA", "ChanB"), positions=((1, 1),), nz=3, nt=2):
+    return [
+        f"/data/{ch}_{sx:03d}_{sy:03d}_{z:03d}_{t:03d}.tif"
+        for ch in channels
+        for sx, sy in positions
+        for z in range(1, nz + 1)
+        for t in range(1, nt + 1)
+    ]
+
+
+@pytest.mark.unit
+def test_hyperstack_paths_in_tcz_order():
+    meta = ThorlabMetadata({}, _names(positions=((1, 1), (2, 1))))
+
+    assert meta.positions() == [(1, 1), (2, 1)]
+    dims, paths = meta.hyperstack(2, 1)
+
+    assert dims == (2, 2, 3)
+    assert paths[:4] == [
+        "/data/ChanA_002_001_001_001.tif",
+        "/data/ChanA_002_001_002_001.tif",
+        "/data/ChanA_002_001_003_001.tif",
+        "/data/ChanB_002_001_001_001.tif",
+    ]
+
+
+@pytest.mark.unit
+def test_hyperstack_rejects_missing_plane():
+    names = _names()
+    names.remove("/data/ChanB_001_001_002_002.tif")
+
+    with pytest.raises(ValueError, match="missing"):
+        ThorlabMetadata({}, names).hyperstack(1, 1)
+
+
+@pytest.mark.unit
+def test_filenames_parsed_to_int_columns_and_bad_names_skipped():
+    names = _names(nz=2, nt=1) + ["/data/Stack.tif", "/data/ChanA_preview.tif"]
+
+    meta = ThorlabMetadata({}, names)
+
+    assert len(meta.df) == 4
+    assert meta.df["filename"].iloc[0] == "ChanA_001_001_001_001.tif"
+    for col in ("stage_x", "stage_y", "z", "t"):
+        assert meta.df[col].dtype == "int64"
+    assert meta.df["z"].tolist() == [1, 2, 1, 2]
+
+
+@pytest.mark.unit
+def test_groups_are_sorted_index_slices():
+    names = list(reversed(_names(positions=((2, 1), (1, 1)), nz=3, nt=2)))
+
+    meta = ThorlabMetadata({"SizeZ": 3, "SizeT": 2}, names)
+    groups = list(meta.groups())
+
+    assert meta.index.dtype["z"] == "int32"
+    assert [key for key, _ in groups][:3] == [
+        ("ChanA", 1, 1, 1),
+        ("ChanA", 1, 1, 2),
+        ("ChanA", 2, 1, 1),
+    ]
+    key, group = groups[0]
+    assert group["z"].tolist() == [1, 2, 3]
+    assert group["path"].tolist() == [
+        "/data/ChanA_001_001_001_001.tif",
+        "/data/ChanA_001_001_002_001.tif",
+        "/data/ChanA_001_001_003_001.tif",
+    ]
+    meta.validate_integrity()
+
+
+@pytest.mark.unit
+def test_validate_integrity_reports_short_groups():
+    names = _names(nz=3, nt=2)
+    names.remove("/data/ChanB_001_001_002_002.tif")
+    meta = ThorlabMetadata({"SizeZ": 3, "SizeT": 2}, names)
+
+    with pytest.raises(ValueError, match=r"\('ChanB', 1, 1, 2\), 2\)"):
+        meta.validate_integrity()
+
+    # grouping is computed once and shared with groups()
+    assert meta._grouping() is meta._grouping()
+    assert len(list(meta.groups())) == 4
+
+
+@pytest.mark.unit
+def test_iter_tiff_files_filters_names_while_scanning(tmp_path):
+    for name in ("ChanA_001_001_001_001.tif", "ChanB_001_001_001_001.tiff",
+                 "ChanA_preview.tif", "Stack.tif", "Experiment.xml"):
+        (tmp_path / name).write_bytes(b"")
+    (tmp_path / "ChanA_001_001_002_001.tif").mkdir()
+
+    rejected = []
+    found = sorted(p.rsplit("/", 1)[-1] for p in iter_tiff_files(str(tmp_path), rejected=rejected))
+    loose = sorted(p.rsplit("/", 1)[-1] for p in iter_tiff_files(str(tmp_path), re.compile("Chan")))
+
+    assert found == ["ChanA_001_001_001_001.tif", "ChanB_001_001_001_001.tiff"]
+    assert sorted(p.rsplit("/", 1)[-1] for p in rejected) == ["ChanA_preview.tif", "Stack.tif"]
+    assert loose == ["ChanA_001_001_001_001.tif", "ChanA_preview.tif", "ChanB_001_001_001_001.tiff"]
+
+
+@pytest.mark.unit
+def test_iter_tiff_files_recursive(tmp_path):
+    (tmp_path / "pos2").mkdir()
+    (tmp_path / ".thorlab").mkdir()
+    for name in ("ChanA_001_001_001_001.tif", "pos2/ChanA_002_001_001_001.tif",
+                 ".thorlab/ChanA_003_001_001_001.tif"):
+        (tmp_path / name).write_bytes(b"")
+
+    flat = [p.rsplit("/", 1)[-1] for p in iter_tiff_files(str(tmp_path))]
+    deep = sorted(p.rsplit("/", 1)[-1] for p in iter_tiff_files(str(tmp_path), recursive=True))
+
+    assert flat == ["ChanA_001_001_001_001.tif"]
+    assert deep == ["ChanA_001_001_001_001.tif", "ChanA_002_001_001_001.tif"]
+
+
+@pytest.mark.unit
+def test_parse_filenames_streams_in_chunks(monkeypatch):
+    import thorlab_loader.infile_pattern as infile_pattern
+
+    monkeypatch.setattr(infile_pattern, "PARSE_CHUNK", 3)
+    names = (f"ChanA_001_001_{z:03d}_001.tif" for z in range(1, 8))
+
+    df = infile_pattern.parse_filenames(names)
+
+    assert df["z"].tolist() == list(range(1, 8))
+    assert df["z"].dtype == "int64"
+
+
+@pytest.mark.unit
+def test_df_view_is_built_once_and_assignable():
+    meta = ThorlabMetadata({}, _names(channels=("ChanA",), nz=2, nt=1))
+
+    assert meta.df is meta.df
+    meta.df = meta.df.iloc[:1]
+    assert len(meta.df) == 1
@@ -45,7 +45,7 @@ def test_output_created_unit(fake_local_dataset, tmp_output_root, monkeypatch):
     monkeypatch.setattr(
         builder_module,
         "read_stack",
-        lambda paths: np.zeros((1, 10, 10)),
+        lambda paths, **kwargs: np.zeros((1, 10, 10)),
     )
 
     # --------------------------------------------------
@@ -54,7 +54,7 @@ def test_output_created_unit(fake_local_dataset, tmp_output_root, monkeypatch):
     monkeypatch.setattr(
         builder_module,
         "save_ome_tiff",
-        lambda stack, path: Path(path).touch(),
+        lambda stack, path, **kwargs: Path(path).touch(),
     )
 
     # --------------------------------------------------
@@ -72,3 +72,105 @@ def test_output_created_unit(fake_local_dataset, tmp_output_root, monkeypatch):
     assert len(outputs) == 1
     assert outputs[0].endswith(".ome.tif")
 
+
+
+XML = """<ThorImageExperiment>
+<LSM pixelX="6" pixelY="8" pixelWidthUM="0.5" pixelHeightUM="0.5"/>
+<ZStage steps="3" stepSizeUM="1.0"/>
+<Timelapse timepoints="1" intervalSec="1"/>
+<Wavelengths><Wavelength name="ChanA"/></Wavelengths>
+</ThorImageExperiment>"""
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("output_format", ["ome-tiff", "ome-zarr"])
+def test_lazy_stack_written_plane_by_plane(tmp_path, monkeypatch, output_format):
+    import tifffile
+    import thorlab_loader.builder as builder_module
+
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "Experiment.xml").write_text(XML)
+    planes = [np.full((8, 6), z, dtype=np.uint16) for z in range(3)]
+    for z, plane in enumerate(planes):
+        tifffile.imwrite(src / f"ChanA_001_001_{z + 1:03d}_001.tif", plane)
+
+    def whole_stack(*args, **kwargs):
+        pytest.fail("lazy stack materialized by a whole-array writer")
+
+    monkeypatch.setattr(builder_module, "save_ome_tiff", whole_stack)
+    monkeypatch.setattr(builder_module, "save_plain_tiff", whole_stack)
+
+    builder = ThorlabBuilder(str(src), str(src / "Experiment.xml"), lazy=True)
+    outputs = builder.run_and_save(str(tmp_path / "out"), save_raw=output_format == "ome-zarr",
+                                   output_format=output_format)
+
+    tiffs = [p for p in outputs if p.endswith(".tif")]
+    assert tiffs
+    for p in tiffs:
+        np.testing.assert_array_equal(tifffile.imread(p).reshape(3, 8, 6), np.stack(planes))
+
+
+@pytest.mark.unit
+def test_plan_from_xml_does_not_list_directory(tmp_path, monkeypatch):
+    import os
+    import tifffile
+
+    (tmp_path / "Experiment.xml").write_text(XML)
+    for z in range(1, 4):
+        tifffile.imwrite(tmp_path / f"ChanA_001_001_{z:03d}_001.tif", np.zeros((8, 6), np.uint16))
+    monkeypatch.setattr(os, "scandir", lambda *a: pytest.fail("directory listed"))
+
+    builder = ThorlabBuilder(
+        str(tmp_path), str(tmp_path / "Experiment.xml"), plan_from_xml=True, positions=[(1, 1)]
+    )
+
+    assert builder.plan.complete and builder.plan.digits == 3
+    assert len(builder.tiff_files) == 3
+
+
+@pytest.mark.unit
+def test_discovery_modes_agree_on_nested_layout(tmp_path):
+    import tifffile
+
+    (tmp_path / "Experiment.xml").write_text(XML)
+    (tmp_path / "part2").mkdir()
+    for z in range(1, 4):
+        folder = tmp_path if z < 3 else tmp_path / "part2"
+        tifffile.imwrite(folder / f"ChanA_001_001_{z:03d}_001.tif", np.zeros((8, 6), np.uint16))
+    xml = str(tmp_path / "Experiment.xml")
+
+    found = [
+        sorted(ThorlabBuilder(str(tmp_path), xml, **mode).tiff_files)
+        for mode in ({}, {"use_index": True}, {"plan_from_xml": True})
+    ]
+
+    assert len(found[0]) == 3
+    assert found[1] == found[0] and found[2] == found[0]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("mode", ["position", "series"])
+def test_hyperstack_resume_skips_finished_files(tmp_path, monkeypatch, mode):
+    import tifffile
+    import thorlab_loader.builder as builder_module
+
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "Experiment.xml").write_text(XML)
+    for sx in (1, 2):
+        for z in range(1, 4):
+            tifffile.imwrite(src / f"ChanA_{sx:03d}_001_{z:03d}_001.tif", np.zeros((8, 6), np.uint16))
+    builder = ThorlabBuilder(str(src), str(src / "Experiment.xml"))
+    out = str(tmp_path / "out")
+
+    first = builder.run_and_save(out, hyperstack=mode, resume=True)
+
+    def rewrite(*args, **kwargs):
+        pytest.fail("finished hyperstack rewritten")
+
+    monkeypatch.setattr(builder_module, "save_ome_tiff_stream", rewrite)
+    monkeypatch.setattr(builder_module, "save_ome_tiff_series", rewrite)
+
+    assert builder.run_and_save(out, hyperstack=mode, resume=True) == first
+    assert len(first) == (2 if mode == "position" else 1)
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+import tifffile
+
+from thorlab_loader.tiff_reader import (
+    check_page_counts,
+    iter_planes,
+    lazy_stack,
+    memmap_image,
+    probe_image,
+    read_image,
+    read_planes,
+    read_stack,
+)
+
+
+def _write_planes(tmp_path, n=4, shape=(16, 12), dtype=np.uint16):
+    paths = []
+    planes = []
+    for z in range(n):
+        arr = (np.arange(np.prod(shape)).reshape(shape) + z).astype(dtype)
+        p = tmp_path / f"ChanA_001_001_{z + 1:03d}_001.tif"
+        tifffile.imwrite(p, arr)
+        paths.append(str(p))
+        planes.append(arr)
+    return paths, planes
+
+
+@pytest.mark.unit
+def test_probe_image_reads_header_only(tmp_path):
+    paths, _ = _write_planes(tmp_path, n=1)
+
+    shape, dtype = probe_image(paths[0])
+
+    assert shape == (16, 12)
+    assert dtype == np.uint16
+
+
+@pytest.mark.unit
+def test_read_stack_preallocated(tmp_path):
+    paths, planes = _write_planes(tmp_path)
+
+    stack = read_stack(paths)
+
+    assert stack.shape == (4, 16, 12)
+    assert stack.dtype == np.uint16
+    np.testing.assert_array_equal(stack, np.stack(planes))
+
+
+@pytest.mark.unit
+def test_read_stack_rejects_mismatched_plane(tmp_path):
+    paths, _ = _write_planes(tmp_path, n=2)
+    tifffile.imwrite(paths[1], np.zeros((8, 8), dtype=np.uint16))
+
+    with pytest.raises(ValueError):
+        read_stack(paths)
+
+
+@pytest.mark.unit
+def test_read_image_first_page_only(tmp_path):
+    p = tmp_path / "ChanA_001_001_001_001.tif"
+    data = np.arange(3 * 4 * 5, dtype=np.uint16).reshape(3, 4, 5)
+    tifffile.imwrite(p, data, photometric="minisblack")
+
+    assert check_page_counts([str(p)]) == [(str(p), 3)]
+    np.testing.assert_array_equal(read_image(str(p)), data[0])
+
+
+@pytest.mark.unit
+def test_read_stack_parallel_keeps_z_order(tmp_path):
+    paths, planes = _write_planes(tmp_path, n=9)
+
+    stack = read_stack(paths, workers=4)
+
+    np.testing.assert_array_equal(stack, np.stack(planes))
+
+
+@pytest.mark.unit
+def test_memmap_view_and_compressed_fallback(tmp_path):
+    paths, planes = _write_planes(tmp_path, n=3)
+    tifffile.imwrite(paths[2], planes[2], compression="zlib")
+
+    assert isinstance(memmap_image(paths[0]), np.memmap)
+    assert memmap_image(paths[2]) is None
+
+    np.testing.assert_array_equal(read_stack(paths, memmap=True), np.stack(planes))
+    for view, plane in zip(read_planes(paths), planes):
+        np.testing.assert_array_equal(view, plane)
+
+
+@pytest.mark.unit
+def test_lazy_stack_one_chunk_per_file(tmp_path):
+    paths, planes = _write_planes(tmp_path, n=5)
+
+    stack = lazy_stack(paths)
+
+    assert stack.shape == (5, 16, 12)
+    assert stack.numblocks == (5, 1, 1)
+    np.testing.assert_array_equal(stack.compute(), np.stack(planes))
+
+
+@pytest.mark.unit
+def test_iter_planes_ordered_with_read_ahead(tmp_path):
+    paths, planes = _write_planes(tmp_path, n=7)
+
+    for got, plane in zip(iter_planes(paths, workers=3), planes, strict=True):
+        np.testing.assert_array_equal(got, plane)
@@ -0,0 +1,163 @@
+import numpy as np
+import pytest
+import tifffile
+
+from thorlab_loader.tiff_writer import (
+    compression_kwargs,
+    downsample2x,
+    save_dual_tiff,
+    iter_yx_planes,
+    needs_bigtiff,
+    save_ome_tiff,
+    save_ome_tiff_pyramid,
+    save_ome_tiff_series,
+    save_ome_tiff_stream,
+    save_plain_tiff,
+)
+
+
+@pytest.mark.unit
+def test_save_ome_tiff_stream_from_generator(tmp_path):
+    planes = [np.full((8, 6), z, dtype=np.uint16) for z in range(5)]
+    out = tmp_path / "stream.ome.tif"
+
+    save_ome_tiff_stream((p for p in planes), str(out), (5, 8, 6), np.uint16)
+
+    with tifffile.TiffFile(out) as tif:
+        assert tif.is_ome
+        np.testing.assert_array_equal(tif.asarray(), np.stack(planes))
+
+
+@pytest.mark.unit
+def test_compressed_writers_round_trip(tmp_path):
+    stack = np.random.default_rng(0).integers(0, 50, (3, 64, 64), dtype=np.uint16)
+
+    ome = save_ome_tiff(stack, str(tmp_path / "c.ome.tif"), compression="zstd",
+                        compression_level=5, predictor=True, maxworkers=2)
+    raw = save_plain_tiff(stack, str(tmp_path / "c.tif"), compression="zlib")
+
+    for path, codec in ((ome, 50000), (raw, 8)):
+        with tifffile.TiffFile(path) as tif:
+            assert tif.pages[0].compression == codec
+            np.testing.assert_array_equal(tif.asarray(), stack)
+
+
+@pytest.mark.unit
+def test_unknown_compression_rejected():
+    with pytest.raises(ValueError):
+        compression_kwargs("lz4")
+
+
+@pytest.mark.unit
+def test_downsample2x_block_mean():
+    plane = np.array([[0, 2, 4, 6], [2, 4, 6, 8], [1, 1, 1, 1]], dtype=np.uint16)
+
+    np.testing.assert_array_equal(downsample2x(plane), [[2, 6]])
+
+
+@pytest.mark.unit
+def test_save_ome_tiff_pyramid_levels(tmp_path):
+    stack = np.random.default_rng(1).integers(0, 1000, (2, 128, 96), dtype=np.uint16)
+    out = tmp_path / "pyr.ome.tif"
+
+    save_ome_tiff_pyramid(iter_yx_planes(stack), str(out), stack.shape, stack.dtype,
+                          levels=2, tile=(32, 32), compression="zlib")
+
+    with tifffile.TiffFile(out) as tif:
+        series = tif.series[0]
+        assert tif.pages[0].is_tiled
+        assert len(series.levels) == 3
+        np.testing.assert_array_equal(series.levels[0].asarray(), stack)
+        assert series.levels[1].shape[-2:] == (64, 48)
+        np.testing.assert_array_equal(series.levels[2].asarray()[1], downsample2x(downsample2x(stack[1])))
+
+
+@pytest.mark.unit
+def test_needs_bigtiff_from_projected_size():
+    assert not needs_bigtiff((1, 1, 10, 2048, 2048), np.uint16)
+    # 400 planes of 2048x2048 uint16 = 3.4 GB raw
+    assert not needs_bigtiff((400, 2048, 2048), np.uint16)
+    assert needs_bigtiff((400, 2048, 2048), np.uint16, compression="lzw")
+    assert needs_bigtiff((600, 2048, 2048), np.uint16)
+    assert needs_bigtiff((400, 2048, 2048), np.uint16, pyramid_levels=3)
+
+
+@pytest.mark.unit
+def test_small_output_stays_classic_tiff(tmp_path):
+    out = save_ome_tiff(np.zeros((2, 8, 8), np.uint8), str(tmp_path / "s.ome.tif"))
+
+    with tifffile.TiffFile(out) as tif:
+        assert not tif.is_bigtiff
+
+
+@pytest.mark.unit
+def test_save_ome_tiff_series_multiple_positions(tmp_path):
+    rng = np.random.default_rng(3)
+    stacks = [rng.integers(0, 100, (2, 2, 3, 8, 6), dtype=np.uint16) for _ in range(2)]
+    series = [(f"pos{i}", s.shape, iter_yx_planes(s)) for i, s in enumerate(stacks)]
+    out = tmp_path / "positions.ome.tif"
+
+    save_ome_tiff_series(series, str(out), np.uint16, channel_names=["ChanA", "ChanB"])
+
+    with tifffile.TiffFile(out) as tif:
+        assert len(tif.series) == 2
+        for s, stack in zip(tif.series, stacks):
+            assert s.axes == "TCZYX"
+            np.testing.assert_array_equal(s.asarray(), stack)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("compression", [None, "zlib", "zstd", "lzw"])
+def test_save_dual_tiff_shares_encoded_strips(tmp_path, compression):
+    stack = np.random.default_rng(4).integers(0, 300, (4, 50, 40), dtype=np.uint16)
+    ome, raw = tmp_path / "d.ome.tif", tmp_path / "d.tif"
+
+    save_dual_tiff(iter(stack), str(ome), str(raw), stack.shape, stack.dtype,
+                   compression=compression, predictor=compression is not None, maxworkers=2)
+
+    with tifffile.TiffFile(ome) as a, tifffile.TiffFile(raw) as b:
+        assert a.is_ome and not b.is_ome
+        np.testing.assert_array_equal(a.asarray(), stack)
+        np.testing.assert_array_equal(b.asarray(), stack)
+        if compression:
+            assert a.pages[0].predictor == b.pages[0].predictor == 2
+            fa, fb = a.filehandle, b.filehandle
+            pa, pb = a.pages[0], b.pages[0]
+            fa.seek(pa.dataoffsets[0])
+            fb.seek(pb.dataoffsets[0])
+            assert fa.read(pa.databytecounts[0]) == fb.read(pb.databytecounts[0])
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("compression", ["zlib", "zstd", "lzw"])
+def test_save_dual_tiff_float_predictor_round_trip(tmp_path, compression):
+    stack = np.random.default_rng(5).random((3, 50, 40), dtype=np.float32)
+    ome, raw = tmp_path / "f.ome.tif", tmp_path / "f.tif"
+
+    save_dual_tiff(iter(stack), str(ome), str(raw), stack.shape, stack.dtype,
+                   compression=compression, predictor=True, maxworkers=2)
+
+    for path in (ome, raw):
+        with tifffile.TiffFile(path) as tif:
+            assert tif.pages[0].predictor == 3
+            np.testing.assert_array_equal(tif.asarray(), stack)
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("compression", [None, "zlib"])
+def test_save_dual_tiff_big_endian_memmap_sources(tmp_path, compression):
+    from thorlab_loader.tiff_reader import iter_planes
+
+    stack = np.random.default_rng(6).integers(0, 4000, (3, 20, 16), dtype=np.uint16)
+    paths = []
+    for z, plane in enumerate(stack):
+        paths.append(str(tmp_path / f"ChanA_001_001_{z + 1:03d}_001.tif"))
+        tifffile.imwrite(paths[-1], plane, byteorder=">")
+    planes = iter_planes(paths, memmap=True)
+    ome, raw = tmp_path / "be.ome.tif", tmp_path / "be.tif"
+
+    save_dual_tiff(planes, str(ome), str(raw), stack.shape, np.dtype(">u2"),
+                   compression=compression, predictor=compression is not None)
+
+    for path in (ome, raw):
+        np.testing.assert_array_equal(tifffile.imread(path), stack)
@@ -0,0 +1,46 @@
+import pytest
+
+from thorlab_loader.xml_parser import ExperimentXMLParser
+
+XML = """<?xml version="1.0"?>
+<ThorImageExperiment>
+  <Name name="demo"/>
+  <Wavelengths nyquistExWavelengthNM="488">
+    <Wavelength name="ChanA" exposureTimeMS="0"/>
+    <Wavelength name="ChanB" exposureTimeMS="0"/>
+  </Wavelengths>
+  <ZStage name="ThorZ" steps="12" stepSizeUM="-2.5"/>
+  <Timelapse timepoints="5" intervalSec="30"/>
+  <Magnification mag="20" name="20X"/>
+  <LSM pixelX="512" pixelY="256" pixelWidthUM="0.4" pixelHeightUM="0.4"
+       frameRate="15.2" dwellTime="1.6"/>
+  <CaptureSequence>{filler}</CaptureSequence>
+</ThorImageExperiment>
+"""
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("filler", ["", "<Step index='1'/>" * 5000])
+def test_streaming_matches_full_parse(tmp_path, filler):
+    xml = tmp_path / "Experiment.xml"
+    xml.write_text(XML.format(filler=filler))
+
+    full = ExperimentXMLParser(str(xml)).extract_metadata()
+    fast = ExperimentXMLParser(str(xml), streaming=True)
+
+    assert fast.extract_metadata() == full
+    assert fast.tree is None
+    assert full["Channels"] == ["ChanA", "ChanB"]
+    assert full["SizeZ"] == 12 and full["PixelSizeZ"] == 2.5
+    assert full["Objective"] == "20X"
+
+
+@pytest.mark.unit
+def test_streaming_reads_to_end_when_elements_missing(tmp_path):
+    xml = tmp_path / "Experiment.xml"
+    xml.write_text("<ThorImageExperiment><CaptureSequence/><LSM pixelX='8'/></ThorImageExperiment>")
+
+    fast = ExperimentXMLParser(str(xml), streaming=True).extract_metadata()
+
+    assert fast == ExperimentXMLParser(str(xml)).extract_metadata()
+    assert fast["SizeX"] == 8 and fast["Channels"] == []
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+zarr = pytest.importorskip("zarr")
+
+from thorlab_loader.zarr_writer import save_ome_zarr
+
+
+@pytest.mark.unit
+def test_save_ome_zarr_sharded_parallel(tmp_path):
+    stack = np.random.default_rng(2).integers(0, 4000, (5, 40, 30), dtype=np.uint16)
+    out = tmp_path / "stack.ome.zarr"
+
+    save_ome_zarr(stack, str(out), pixel_size=(2.0, 0.5, 0.5),
+                  chunks=(1, 1, 1, 16, 16), shards=(1, 1, 2, 48, 32), workers=3)
+
+    root = zarr.open_group(str(out), mode="r")
+    image = root["0"]
+    assert image.shape == (1, 1, 5, 40, 30)
+    assert image.shards == (1, 1, 2, 48, 32)
+    np.testing.assert_array_equal(image[0, 0], stack)
+
+    scale = root.attrs["ome"]["multiscales"][0]["datasets"][0]["coordinateTransformations"][0]["scale"]
+    assert scale[2:] == [2.0, 0.5, 0.5]